@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import sys
+import time
+from .company import Company
+from .operations import apply_operation, create_company
+
+# TO RUN: company-ownership scenario.jsonl --final-snapshot --timings
+
+_CHUNK_SIZE = 1 << 16
+
+def _iter_jsonl(file):
+    '''Yields one operation per non-empty line'''
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+def _iter_json(file):
+    """
+    Yields the operations of a JSON array one by one, without reading the whole file into memory.
+
+    Raises:
+        ValueError: If the file is not a JSON array of objects, e.g. a comma is missing or extra.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    expected = '[' # '[', then a 'value' or ']' for the first one, and a ',' or ']' after every value
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+
+        if position == len(buffer):
+            if eof:
+                raise ValueError('The JSON operation file ended before the closing "]"')
+            buffer = file.read(_CHUNK_SIZE)
+            position = 0
+            eof = not buffer
+            continue
+
+        character = buffer[position]
+        if expected == '[':
+            if character != '[':
+                raise ValueError('A JSON operation file must contain an array of operations')
+            expected = 'value or ]'
+            position += 1
+            continue
+        if expected == ', or ]':
+            if character not in ',]':
+                raise ValueError(f'Expected "," or "]" after an operation, at {character!r}')
+            if character == ']':
+                return
+            expected = 'value'
+            position += 1
+            continue
+        if character == ']' and expected == 'value or ]':
+            return
+        if character in ',]':
+            raise ValueError(f'Expected an operation, at {character!r}')
+
+        try:
+            operation, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(_CHUNK_SIZE) # The operation continues in the next chunk
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        if not isinstance(operation, dict):
+            raise ValueError(f'An operation must be an object, not {operation!r}')
+        expected = ', or ]'
+        yield operation
+
+def _iter_yaml(file):
+    """
+    Yields the operations of a YAML file. Every document is either one operation or a list of operations.
+
+    The file is read one document at a time, so a large file should have one operation per document (separated by
+    ---). A document with a list of operations is read into memory as a whole.
+    """
+    try:
+        import yaml
+    except ImportError as e:
+        raise ImportError('Reading YAML operation files requires PyYAML (pip install pyyaml)') from e
+
+    for document in yaml.safe_load_all(file):
+        if isinstance(document, list):
+            yield from document
+        elif document is not None:
+            yield document
+
+_READERS = {'jsonl': _iter_jsonl, 'json': _iter_json, 'yaml': _iter_yaml}
+_EXTENSIONS = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json', '.yaml': 'yaml', '.yml': 'yaml'}
+
+def iter_operations(file, file_format:str):
+    """
+    Streams the operations in an open operation file.
+
+    Parameters:
+        file: The open (text) file.
+        file_format (str): One of 'jsonl', 'json' or 'yaml'.
+
+    Returns:
+        An iterator over the operations (dicts).
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format not in _READERS:
+        raise ValueError(f"Unknown operation file format: {file_format}")
+    return _READERS[file_format](file)
+
+def _snapshot(company:Company, n_operations:int) -> str:
+    return json.dumps({'operations': n_operations, 'number_of_stocks': company.number_of_stocks, 'owners': company.owners})
+
+# The errors of invalid operations, which are reported without a traceback
+_OPERATION_ERRORS = (ValueError, KeyError, RuntimeError, TypeError, AssertionError, ZeroDivisionError)
+
+def _operation_error(error:Exception, index:int, op:str) -> Exception:
+    '''The same type of error, saying which operation failed'''
+    message = error.args[0] if len(error.args) == 1 else error # KeyError would quote str(error)
+    return type(error)(f'Operation {index} ({op}): {message}')
+
+def replay(operations, company:Company=None, write_history:bool=True, keep_last:int=None,
+           snapshot_every:int=None, final_snapshot:bool=False, output=None, timings_output=None) -> tuple[Company, dict]:
+    """
+    Replays a stream of operations on a company.
+
+    The first operation may be a 'company' operation creating the company. Otherwise the company must be given.
+
+    Parameters:
+        operations: An iterable of operations (see operations.apply_operation).
+        company (Company): The company to replay on, if the operations do not create it.
+        write_history (bool): If False, the operations do not write to the history (unless they say so themselves).
+        keep_last (int): If given, the history is compacted every 'keep_last' operations, keeping the last 'keep_last' events.
+        snapshot_every (int): If given, a snapshot is written to 'output' every n operations.
+        final_snapshot (bool): If True, a snapshot is written to 'output' at the end.
+        output: A text file for the snapshots (JSON lines). Defaults to stdout.
+        timings_output: A text file for the time of every operation (CSV lines), if given.
+
+    Returns:
+        tuple: The company and the timings per operation type as {op: {'count', 'total', 'max'}} in seconds.
+
+    Raises:
+        ValueError: If there is no company to replay on.
+        ValueError, KeyError, RuntimeError, TypeError, AssertionError, ZeroDivisionError: If an operation fails,
+            with the index (counting from 0) and 'op' of the operation in the message.
+    """
+    output = output or sys.stdout
+    defaults = {} if write_history else {'write_history': False}
+    timings = {}
+    n_operations = 0
+
+    if keep_last is not None and company is not None:
+        company.set_history_retention(keep_last=keep_last)
+
+    if timings_output is not None:
+        timings_output.write('index,op,seconds\n')
+
+    for index, operation in enumerate(operations):
+        if operation.get('op') == 'company':
+            if company is not None:
+                raise ValueError(f'Operation {index} (company): The company can only be created by the first operation')
+            try:
+                company = create_company(operation)
+            except _OPERATION_ERRORS as e:
+                raise _operation_error(e, index, 'company') from e
+            if keep_last is not None:
+                company.set_history_retention(keep_last=keep_last)
+            continue
+
+        if company is None:
+            raise ValueError('No company: give one, or start the operations with a "company" operation')
+
+        op = operation.get('op')
+        start = time.perf_counter()
+        try:
+            apply_operation(company, operation, **defaults)
+        except _OPERATION_ERRORS as e:
+            raise _operation_error(e, index, op) from e
+        elapsed = time.perf_counter() - start
+
+        timing = timings.setdefault(op, {'count': 0, 'total': 0.0, 'max': 0.0})
+        timing['count'] += 1
+        timing['total'] += elapsed
+        timing['max'] = max(timing['max'], elapsed)
+        if timings_output is not None:
+            timings_output.write(f'{n_operations},{op},{elapsed:.9f}\n')
+
+        n_operations += 1
+        if keep_last is not None and n_operations % keep_last == 0:
+            company.compact_history()
+        if snapshot_every is not None and n_operations % snapshot_every == 0:
+            output.write(_snapshot(company, n_operations) + '\n')
+
+    if company is None:
+        raise ValueError('No company: give one, or start the operations with a "company" operation')
+
+    if final_snapshot:
+        output.write(_snapshot(company, n_operations) + '\n')
+
+    return company, timings
+
+def _format_timings(timings:dict) -> str:
+    lines = [f"{'operation':<34}{'count':>10}{'total [s]':>12}{'mean [us]':>12}{'max [us]':>12}"]
+    for op, timing in sorted(timings.items()):
+        mean = timing['total'] / timing['count'] * 1e6
+        lines.append(f"{op:<34}{timing['count']:>10}{timing['total']:>12.4f}{mean:>12.2f}{timing['max'] * 1e6:>12.2f}")
+    return '\n'.join(lines)
+
+def main(argv:list=None) -> int:
+    '''The company-ownership command line entry point'''
+    parser = argparse.ArgumentParser(prog='company-ownership', description='Replays an operation file (JSON, JSON lines or YAML) through a Company.')
+    parser.add_argument('file', help='The operation file, or - for JSON lines on stdin.')
+    parser.add_argument('--format', choices=sorted(_READERS), help='The format of the operation file. Defaults to the file extension.')
+    parser.add_argument('--name', help='The name of the company, if the file does not start with a "company" operation.')
+    parser.add_argument('--original-owner', help='The original owner of the company.')
+    parser.add_argument('--n-stocks', type=int, default=100, help='The number of stocks of the original owner.')
+    parser.add_argument('--no-history', action='store_true', help='Do not write the operations to the history.')
+    parser.add_argument('--keep-last', type=int, help='Compact the history regularly, keeping the last n events.')
+    parser.add_argument('--snapshot-every', type=int, help='Write a snapshot every n operations.')
+    parser.add_argument('--final-snapshot', action='store_true', help='Write a snapshot at the end.')
+    parser.add_argument('--output', help='The file for the snapshots. Defaults to stdout.')
+    parser.add_argument('--timings', action='store_true', help='Print a summary of the time per operation type to stderr.')
+    parser.add_argument('--timings-file', help='Write the time of every operation to this CSV file.')
+    args = parser.parse_args(argv)
+
+    file_format = args.format
+    if file_format is None:
+        file_format = 'jsonl' if args.file == '-' else _EXTENSIONS.get(os.path.splitext(args.file)[1].lower())
+    if file_format is None:
+        parser.error('Could not tell the format from the file extension, use --format')
+
+    company = Company(args.name, args.original_owner, args.n_stocks) if args.name else None
+
+    input_file = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8')
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    timings_output = open(args.timings_file, 'w', encoding='utf-8') if args.timings_file else None
+    try:
+        _, timings = replay(iter_operations(input_file, file_format), company=company, write_history=not args.no_history,
+                            keep_last=args.keep_last, snapshot_every=args.snapshot_every, final_snapshot=args.final_snapshot,
+                            output=output, timings_output=timings_output)
+    except _OPERATION_ERRORS as e:
+        message = e.args[0] if len(e.args) == 1 else e
+        print(f'company-ownership: error: {message}', file=sys.stderr)
+        return 1
+    finally:
+        for file in (input_file, output, timings_output):
+            if file not in (None, sys.stdin, sys.stdout):
+                file.close()
+
+    if args.timings:
+        print(_format_timings(timings), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,160 @@
 from operator import itemgetter
+from functools import wraps, partial
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+import inspect
+from concurrent.futures import Future
+import threading
+import sys
 import pandas as pd
 from copy import deepcopy
+from .rounds import solve_round
+from .share_classes import ShareClassTable, DEFAULT_SHARE_CLASS
+from .scaling import scale_stocks
+
+def _deep_sizeof(obj, seen:set=None) -> int:
+    '''
+    Returns the approximate number of bytes used by an object and everything it contains.
+    Objects that are referenced more than once are only counted once.
+    '''
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+def _mutation(method=None, operation:str=None):
+    '''
+    Marks a method that changes the company. Nested calls count as one change, after which the version is increased.
+
+    If 'operation' is given, the call is recorded with its arguments in the history events it writes, so that it can be replayed.
+    '''
+    if method is None:
+        return partial(_mutation, operation=operation)
+
+    signature = inspect.signature(method)
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self._begin_mutation()
+        recording = False
+        try:
+            if operation is not None and self._operation is None:
+                arguments = signature.bind(self, *args, **kwargs).arguments
+                self._operation = {'op': operation, **{k: dict(v) if isinstance(v, dict) else v for k, v in arguments.items() if k != 'self'}}
+                recording = True
+                n_events_written = self._n_events_written
+            result = method(self, *args, **kwargs)
+            if recording and self._n_events_written == n_events_written: # E.g. write_history=False
+                self._mark_unrecorded_change()
+            return result
+        finally:
+            if recording:
+                self._operation = None
+            self._end_mutation()
+    return wrapper
+
+def _cached_query(method):
+    '''
+    Memoizes a reading method in the query cache of the company (see Company.enable_query_cache), for as long as the
+    version of the company stays the same. The cache is not used in the middle of a change.
+    '''
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        cache = self._query_cache
+        if cache is None or self._mutation_depth > 0:
+            return method(self, *args, **kwargs)
+        if self._query_cache_version != self._version: # Every change bumps the version, and invalidates everything
+            cache.clear()
+            self._query_cache_version = self._version
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            result = cache[key]
+        except TypeError: # Unhashable arguments
+            return method(self, *args, **kwargs)
+        except KeyError:
+            self._query_cache_info['misses'] += 1
+            result = cache[key] = method(self, *args, **kwargs)
+            if len(cache) > self._query_cache_info['maxsize']:
+                cache.popitem(last=False)
+            return result
+        self._query_cache_info['hits'] += 1
+        cache.move_to_end(key)
+        return result
+    return wrapper
+
+def _read_only(value):
+    '''Wraps dictionaries (and lists) so that nothing inside them can be changed'''
+    if isinstance(value, dict):
+        return ReadOnlyDict(value)
+    if isinstance(value, list):
+        return tuple(_read_only(item) for item in value)
+    return value
+
+class ReadOnlyDict(Mapping):
+    '''A read-only view of a dictionary, which also wraps the dictionaries inside it when they are read'''
+    __slots__ = ('_data',)
+
+    def __init__(self, data:dict) -> None:
+        self._data = data
+
+    def __getitem__(self, key):
+        return _read_only(self._data[key])
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return repr(self._data)
+
+class EventView(Mapping):
+    """
+    A read-only view of an event in the history, with only some of its fields and owners (see Company.iter_history).
+
+    Nothing is copied: the values are read from the event when they are used, and dictionaries are returned as read-only
+    views, also the ones inside them (e.g. the arguments of the 'operation').
+    """
+    __slots__ = ('_event', '_fields', '_owners')
+
+    def __init__(self, event:dict, fields:tuple=None, owners:tuple=None) -> None:
+        self._event = event
+        self._fields = fields
+        self._owners = owners
+
+    def __getitem__(self, key:str):
+        if self._fields is not None and key not in self._fields:
+            raise KeyError(key)
+        value = self._event[key]
+        if key == 'owners' and self._owners is not None:
+            return MappingProxyType({name: value[name] for name in self._owners if name in value})
+        return _read_only(value)
+
+    def __iter__(self):
+        if self._fields is None:
+            return iter(self._event)
+        return (key for key in self._fields if key in self._event)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f'EventView({dict(self)})'
 
 class Company:
+    _thread_safe: bool = False # If it can be changed from several threads, see threadsafe.ThreadSafeCompany
+
     def __init__(self, name:str, original_owner:str=None, n_stocks:int=100) -> None:
         '''
         Initiate a new company with its name, the original owner, and the number of stocks.
@@ -15,6 +167,22 @@ class Company:
         self.name: str = name
         self._owners: dict = dict()
         self._history: list = []
+        self._history_retention: dict = {'keep_last': None, 'checkpoint_every': None, 'merge_consecutive': True}
+        self._mutation_depth: int = 0
+        self._version: int = 0
+        self._subscribers: list = []
+        self._owners_before: dict = None
+        self._operation: dict = None # The operation being applied, recorded in the history
+        self._n_events_written: int = 0
+        self._unrecorded_change: int = None # The id of the last event when the holdings were last changed without writing an event
+        self._event_type_index: dict = {} # Events by event type
+        self._operation_index: dict = {} # Events by operation
+        self._owner_index: dict = {} # Events by the owners involved
+        self._owned_index_lists: set = None # While replaying, the ids of the index lists that may be changed in place
+        self._share_classes: ShareClassTable = ShareClassTable() # The holdings of the other share classes than the default one
+        self._query_cache: OrderedDict = None # See enable_query_cache
+        self._query_cache_version: int = None
+        self._query_cache_info: dict = None
         if original_owner: 
             self.add_owner(name=original_owner, n_stocks=n_stocks) # Adding the original owner - if it is given
 
@@ -44,6 +212,7 @@ class Company:
                 f"Current ownership:\n"
                 f"{owners_str}")
 
+    @_cached_query
     def _ordered_owner_dict(self, reverse=True) -> dict:
         '''
         Order the owner dictionary based on the number of stocks each owner has.
@@ -53,6 +222,7 @@ class Company:
         '''  
         return dict(sorted(self._owners.items(), key=itemgetter(1), reverse=reverse))
 
+    @_cached_query
     def _get_owner_percentage(self, name:str, multiplicator:float=100) -> float:
         """
         Returns the percentage of company stocks owned by a given owner.
@@ -80,7 +250,7 @@ class Company:
     
     def _get_scaled_owner_dict(self, desired_number_of_stocks:int) -> dict:
         """
-        Returns a dictionary with each owner's scaled number of stocks.
+        Returns a dictionary with each owner's scaled number of stocks, adding up to exactly the desired number (see scaling.scale_stocks).
 
         Parameters:
         desired_number_of_stocks (int): The total number of stocks to which the current ownership ratios should be scaled.
@@ -98,10 +268,7 @@ class Company:
         if current_number_of_stocks == 0:
             raise ZeroDivisionError("The current number of stocks is zero, scaling is impossible.")
 
-        scale_ratio = desired_number_of_stocks / current_number_of_stocks
-        new_owners_dict = {name: round(owner_number_of_stocks * scale_ratio)
-                        for name, owner_number_of_stocks in self._owners.items()}
-        return new_owners_dict
+        return dict(zip(self._owners, scale_stocks(list(self._owners.values()), desired_number_of_stocks)))
 
     @property
     def owners(self) -> dict:
@@ -114,6 +281,7 @@ class Company:
         return self._owners
 
     @owners.setter
+    @_mutation
     def owners(self, owners: dict) -> None:
         """
         Set the owners of the stocks.
@@ -122,10 +290,98 @@ class Company:
         owners (dict): A dictionary of owners and their respective stocks.
         """
         assert isinstance(owners, dict), "'owners' must be a dictionary."
+        if self._operation is None: # Not part of an operation that writes an event
+            self._mark_unrecorded_change()
         self._owners = owners
         self._owners_cleanup() # Every time it is updated, it also cleans up
         assert len(self._owners) > 0, "A company cannot be ownerless"
 
+    @property
+    def version(self) -> int:
+        """
+        Get the version of the company, which is increased by every change.
+
+        Returns:
+        int: The version.
+        """
+        return self._version
+
+    def enable_query_cache(self, maxsize:int=128) -> None:
+        """
+        Memoizes the reading methods owner_history, history_dataframe, _ordered_owner_dict and _get_owner_percentage.
+
+        Repeated calls with the same arguments return the same result object until the company changes, so the
+        results must not be modified. Every change increases the version of the company, which invalidates the cache.
+
+        Parameters:
+            maxsize (int): The maximum number of results kept. The least recently used ones are evicted first.
+        """
+        self._query_cache = OrderedDict()
+        self._query_cache_version = self._version
+        self._query_cache_info = {'hits': 0, 'misses': 0, 'maxsize': maxsize}
+
+    def disable_query_cache(self) -> None:
+        '''Stops memoizing the reading methods, and empties the cache'''
+        self._query_cache = None
+        self._query_cache_info = None
+
+    def cache_info(self) -> dict:
+        """
+        Get the statistics of the query cache.
+
+        Returns:
+            dict: The number of 'hits' and 'misses', the current 'size' and the 'maxsize', or None if the cache is not enabled.
+        """
+        if self._query_cache is None:
+            return None
+        return {**self._query_cache_info, 'size': len(self._query_cache)}
+
+    def subscribe(self, callback) -> None:
+        """
+        Subscribes to the changes of the company.
+
+        After every change, the callback is called as callback(company, changes), where changes is a dictionary of
+        the owners whose number of stocks changed, with (stocks before, stocks after) as values. Owners that were 
+        added or removed have 0 stocks before or after.
+
+        Parameters:
+            callback (callable): The function to call.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback) -> None:
+        """
+        Stops calling a subscribed callback.
+
+        Raises:
+            ValueError: If the callback is not subscribed.
+        """
+        self._subscribers.remove(callback)
+
+    def _begin_mutation(self) -> None:
+        '''Called before every change of the company'''
+        if self._mutation_depth == 0 and self._subscribers:
+            self._owners_before = dict(self._owners)
+        self._mutation_depth += 1
+
+    def _end_mutation(self) -> None:
+        '''Called after every change of the company, also if it failed'''
+        self._mutation_depth -= 1
+        if self._mutation_depth == 0:
+            self._version += 1
+            if self._owners_before is not None:
+                before, after = self._owners_before, self._owners
+                self._owners_before = None
+                changes = {name: (stocks, after.get(name, 0)) for name, stocks in before.items() if after.get(name, 0) != stocks}
+                changes.update({name: (0, stocks) for name, stocks in after.items() if name not in before})
+                if changes:
+                    for callback in list(self._subscribers):
+                        callback(self, changes)
+
+    def _mark_unrecorded_change(self) -> None:
+        '''Remembers that the holdings were changed without an event, which the history cannot be replayed over'''
+        self._unrecorded_change = self._history[-1]['id'] if self._history else -1
+
     def _owners_cleanup(self) -> None:
         '''Cleans up the owner dictionary by removing any that has 0 stocks'''
         self._owners = {k:v for k,v in self._owners.items() if v > 0}
@@ -141,6 +397,7 @@ class Company:
         return self._history
 
     @history.setter
+    @_mutation
     def history(self, history: list) -> None:
         """
         Set the history of stock ownership.
@@ -150,8 +407,10 @@ class Company:
         """
         assert isinstance(history, list), "'history' must be a list."
         self._history = list(history)
+        self._rebuild_history_indexes()
 
-    def add_to_history(self, event_type: str = '', description: str = '', external_description: str = '') -> None:
+    @_mutation
+    def add_to_history(self, event_type: str = '', description: str = '', external_description: str = '', fields: dict = None) -> None:
         """
         Adds an event to the history.
 
@@ -159,9 +418,131 @@ class Company:
         event_type (str, optional): The type of event. Defaults to an empty string.
         description (str, optional): Description of the event. Defaults to an empty string.
         external_description (str, optional): External description of the event. Defaults to an empty string.
+        fields (dict, optional): Structured details of the event: 'donor', 'receiver', 'amounts' (the stocks added to, 
+                                 or removed from, each owner), 'expansion' or 'shrink', and 'share_class' if it is not
+                                 the default one. Used by query_history.
+        """
+        id = self._history[-1]['id'] + 1 if self._history else 0 # Ids stay unique after compaction
+        event = {'id': id, 'event_type': event_type, 'description': description, 'owners': deepcopy(self.owners), 'external_description': external_description}
+        if self._operation is not None:
+            event['operation'] = self._operation
+        event['fields'] = fields or {}
+        self._history.append(event)
+        self._index_history_event(event)
+        self._n_events_written += 1
+
+    def set_history_retention(self, keep_last:int=None, checkpoint_every:int=None, merge_consecutive:bool=True) -> None:
+        """
+        Configures how the history is reduced when it is compacted.
+
+        The history has no time stamps, so checkpoints are taken per number of events and not per day or month.
+
+        Parameters:
+            keep_last (int): The number of most recent events that are always kept untouched. None keeps everything.
+            checkpoint_every (int): Of the older events, only every n-th is kept as a checkpoint. None keeps all of them.
+            merge_consecutive (bool): If True, consecutive older events of the same type are merged into one event.
+
+        Raises:
+            ValueError: If 'keep_last' is negative or 'checkpoint_every' is not positive.
         """
-        id = len(self.history)
-        self._history.append({'id': id, 'event_type': event_type, 'description': description, 'owners': deepcopy(self.owners), 'external_description': external_description})
+        if keep_last is not None and keep_last < 0:
+            raise ValueError("'keep_last' cannot be negative")
+        if checkpoint_every is not None and checkpoint_every < 1:
+            raise ValueError("'checkpoint_every' must be a positive integer")
+
+        self._history_retention = {'keep_last': keep_last, 'checkpoint_every': checkpoint_every, 'merge_consecutive': merge_consecutive}
+
+    @staticmethod
+    def _merge_history_events(events:list) -> dict:
+        '''Merges a run of events into one event, keeping the ownership of the last one'''
+        if len(events) == 1:
+            return events[0]
+
+        merged = events[-1].copy()
+        merged['description'] = '; '.join(event['description'] for event in events)
+        merged['external_description'] = '; '.join(event['external_description'] for event in events if event['external_description'])
+        merged['n_events'] = sum(event.get('n_events', 1) for event in events)
+
+        amounts = {}
+        for event in events:
+            for name, n_stocks in event.get('fields', {}).get('amounts', {}).items():
+                amounts[name] = amounts.get(name, 0) + n_stocks
+        fields = {'amounts': amounts}
+        for key in ('donor', 'receiver', 'expansion', 'shrink', 'share_class'):
+            values = {event.get('fields', {}).get(key) for event in events}
+            if len(values) == 1 and None not in values:
+                fields[key] = values.pop()
+        merged['fields'] = fields
+        return merged
+
+    def _compacted_history(self, history:list) -> list:
+        '''Returns a compacted copy of the given history according to the retention policy'''
+        keep_last = self._history_retention['keep_last']
+        checkpoint_every = self._history_retention['checkpoint_every']
+
+        if keep_last is None or len(history) <= keep_last:
+            return history
+
+        split = len(history) - keep_last
+        older, recent = history[:split], history[split:]
+
+        if self._history_retention['merge_consecutive']:
+            runs = []
+            for event in older:
+                if runs and runs[-1][-1]['event_type'] == event['event_type']:
+                    runs[-1].append(event)
+                else:
+                    runs.append([event])
+            older = [self._merge_history_events(run) for run in runs]
+
+        if checkpoint_every is not None:
+            older = older[::checkpoint_every]
+
+        return older + recent
+
+    @_mutation
+    def _compact_history(self) -> int:
+        '''Compacts the history and returns the number of bytes reclaimed'''
+        history = self._history
+        n_events = len(history)
+        compacted = self._compacted_history(history)
+        if compacted is history:
+            return 0
+        reclaimed = _deep_sizeof(history) - _deep_sizeof(compacted)
+
+        # Events that were added while compacting are kept as they are
+        self._history = compacted + self._history[n_events:]
+        self._rebuild_history_indexes()
+        return reclaimed
+
+    def compact_history(self, background:bool=False) -> int|Future:
+        """
+        Compacts the history according to the retention policy set with 'set_history_retention'.
+
+        Parameters:
+            background (bool): If True, the compaction runs in a separate thread and a Future is returned.
+                               Only for a ThreadSafeCompany, which other threads can keep changing meanwhile.
+
+        Returns:
+            int|Future: The approximate number of bytes reclaimed, or a Future resolving to it.
+
+        Raises:
+            RuntimeError: If background is True and the company is not thread safe.
+        """
+        if not background:
+            return self._compact_history()
+
+        if not self._thread_safe:
+            raise RuntimeError('Compacting in the background needs a ThreadSafeCompany, a Company cannot be changed from several threads')
+
+        future = Future()
+        def run():
+            try:
+                future.set_result(self._compact_history())
+            except BaseException as e:
+                future.set_exception(e)
+        threading.Thread(target=run, daemon=True).start()
+        return future
 
     @property
     def number_of_stocks(self) -> int:
@@ -174,6 +555,7 @@ class Company:
         return sum(self._owners.values())
 
     @number_of_stocks.setter
+    @_mutation(operation='set_number_of_stocks')
     def number_of_stocks(self, number_of_stocks: int = 1000) -> None:
         """
         Scales the total number of stocks to the desired number based upon the current ownership distribution.
@@ -187,11 +569,12 @@ class Company:
         assert isinstance(number_of_stocks, int) and number_of_stocks > 0, "'number_of_stocks' must be a positive integer."
         current_number_of_stocks = self.number_of_stocks
         self.owners = self._get_scaled_owner_dict(desired_number_of_stocks=number_of_stocks)
-        self.add_to_history('Rescaling of the total number of stocks', f'{current_number_of_stocks} -> {number_of_stocks}', str(self.owners))
+        self.add_to_history('Rescaling of the total number of stocks', f'{current_number_of_stocks} -> {number_of_stocks}', str(self.owners), {'expansion': number_of_stocks > current_number_of_stocks})
 
 
     ## Adding functions
-    def add_owner(self, name:str, n_stocks:int, expansion:bool=True, write_history:bool=True, external_description:str='') -> int:
+    @_mutation(operation='add_owner')
+    def add_owner(self, name:str, n_stocks:int, expansion:bool=True, write_history:bool=True, external_description:str='', share_class:str=None) -> int:
         """
         Modifies the stock count of an owner based on the expansion flag.
 
@@ -205,13 +588,24 @@ class Company:
                             If False, the total number of stocks are readjusted (rescaled).
             write_history (bool): Flag to decide if the action should be recorded in history.
             external_description (str): Additional notes about the action to be added to history.
+            share_class (str): The share class of the stocks, see define_share_class. None is the default class.
 
         Returns:
-            int: The updated number of stocks the owner has after the operation.
+            int: The updated number of stocks the owner has after the operation (of the share class).
 
         Raises:
-            ValueError: If the desired number of stocks is more than the current total stocks during rescaling.
+            KeyError: If the share class is not defined.
+            ValueError: If the desired number of stocks is more than the current total stocks during rescaling,
+                        or if another share class than the default one is added without expansion.
         """
+        if share_class not in (None, DEFAULT_SHARE_CLASS):
+            if not expansion:
+                raise ValueError('Only the default share class can be rescaled, use expansion for the other classes')
+            owner_stocks = self._share_classes.add(name, share_class, n_stocks)
+            if write_history:
+                self.add_to_history(f'Adding {share_class} stocks (expansion)', f'{name}: {owner_stocks - n_stocks} -> {owner_stocks}', external_description,
+                                    {'receiver': name, 'amounts': {name: n_stocks}, 'expansion': True, 'share_class': share_class})
+            return owner_stocks
 
         if not expansion: # Rescales the current number of stocks
             current_number_of_stocks = self.number_of_stocks
@@ -227,13 +621,15 @@ class Company:
         if write_history:
             action = 'Adding new owner' if not owner_exists else 'Adding stocks to owner'
             action += ' (expansion)' if expansion else ' (not expansion)'
-            self.add_to_history(action, f'{name}: {owner_current_stocks} -> {self._owners[name]}',  external_description)
+            self.add_to_history(action, f'{name}: {owner_current_stocks} -> {self._owners[name]}',  external_description,
+                                {'receiver': name, 'amounts': {name: n_stocks}, 'expansion': expansion})
 
         self._owners_cleanup() # Cleans up the owners dict
 
         return self._owners[name]
     
-    def add_owners(self, new_owners:dict, expansion:bool=True, write_history:bool=True, external_description:str='') -> int:
+    @_mutation(operation='add_owners')
+    def add_owners(self, new_owners:dict, expansion:bool=True, write_history:bool=True, external_description:str='', share_class:str=None) -> int:
         """
         Adds multiple owners with their respective stock counts at the same time. 
 
@@ -244,15 +640,27 @@ class Company:
             expansion (bool): Flag to indicate whether the operation is expansion (adding stocks) or rescaling.
             write_history (bool): Flag to decide if the action should be recorded in history.
             external_description (str): Additional notes about the action to be added to history.
+            share_class (str): The share class of the stocks, see define_share_class. None is the default class.
 
         Returns:
             int: The total number of stocks that were added across all new owners.
 
         Raises:
-            ValueError: If the desired number of stocks is more than the current total stocks during rescaling.
+            KeyError: If the share class is not defined.
+            ValueError: If the desired number of stocks is more than the current total stocks during rescaling,
+                        or if another share class than the default one is added without expansion.
         """
 
         total_stocks_to_add = sum(new_owners.values())
+
+        if share_class not in (None, DEFAULT_SHARE_CLASS):
+            if not expansion:
+                raise ValueError('Only the default share class can be rescaled, use expansion for the other classes')
+            self._share_classes.add_many(new_owners, share_class)
+            if write_history:
+                self.add_to_history(f'Adding multiple owners of {share_class} stocks (expansion)', f'Number of owners: {len(new_owners)}, with a total of {total_stocks_to_add} stocks',
+                                    external_description, {'amounts': dict(new_owners), 'expansion': True, 'share_class': share_class})
+            return total_stocks_to_add
         current_number_of_stocks = self.number_of_stocks
 
         if total_stocks_to_add > current_number_of_stocks and not expansion:
@@ -273,12 +681,14 @@ class Company:
 
         if write_history: 
             expansion_text = 'expansion' if expansion else 'not expansion'
-            self.add_to_history(f'Adding multiple owners ({expansion_text})', f'Number of owners: {len(new_owners)}, with a total of {total_stocks_to_add} stocks',  external_description)
+            self.add_to_history(f'Adding multiple owners ({expansion_text})', f'Number of owners: {len(new_owners)}, with a total of {total_stocks_to_add} stocks',  external_description,
+                                {'amounts': dict(new_owners), 'expansion': expansion})
 
         self._owners_cleanup() # Cleans up the owners dict
 
         return total_stocks_to_add
 
+    @_mutation(operation='add_owner_percentage')
     def add_owner_percentage(self, name:str, n_percentages:float, expansion=True, write_history=True, external_description:str='') -> int:
         """
         Adds or updates a new owner with a given percentage of the company. 
@@ -312,6 +722,7 @@ class Company:
 
         return self.add_owner(name, desired_number_of_stocks, expansion, write_history, external_description)
 
+    @_mutation(operation='add_owners_percentage')
     def add_owners_percentage(self, new_owners: dict, expansion=True, write_history=True, external_description='') -> int:
         """
         Adds multiple owners based on the percentage of the company that they should own.
@@ -335,16 +746,19 @@ class Company:
         if total_percentages_to_add > 100:
             raise ValueError('The total percentages to add cannot exceed 100%')
 
+        amounts = {}
         if expansion: 
             new_dict = self._owners.copy()
             for name, percentage in new_owners.items():
                 n_stocks = round( (percentage / 100 * current_number_of_stocks) / (1 - percentage / 100))
                 new_dict[name] = new_dict.get(name, 0) + n_stocks
+                amounts[name] = n_stocks
         else: 
             new_dict = self._get_scaled_owner_dict(round(current_number_of_stocks * (1 - total_percentages_to_add / 100)))
             for name, percentage in new_owners.items():
                 n_stocks = round(current_number_of_stocks * percentage / 100)
                 new_dict[name] = new_dict.get(name, 0) + n_stocks
+                amounts[name] = n_stocks
 
         self._owners = new_dict
 
@@ -356,7 +770,8 @@ class Company:
             self.add_to_history(
                 f'Adding multiple owners by percentage ({expansion_txt})', 
                 f'Number of owners: {number_of_owners_to_be_added}, with a total of {total_stocks_added} stocks', 
-                external_description
+                external_description,
+                {'amounts': amounts, 'expansion': expansion}
             )
             
         self._owners_cleanup()  # Cleans up the owners dict
@@ -365,7 +780,8 @@ class Company:
 
 
     ## Removal functions
-    def remove_owner(self, name:str, n_stocks:int=None, shrink=True, write_history=True, external_description:str='') -> int:
+    @_mutation(operation='remove_owner')
+    def remove_owner(self, name:str, n_stocks:int=None, shrink=True, write_history=True, external_description:str='', share_class:str=None) -> int:
         """
         Removes an owner or reduces the number of stocks for the owner based on the shrink flag.
 
@@ -377,15 +793,31 @@ class Company:
                             If False, the total number of stocks are kept constant (rescaled).
             write_history (bool): Flag to decide if the action should be recorded in history.
             external_description (str): Additional notes about the action to be added to history.
+            share_class (str): The share class of the stocks, see define_share_class. None is the default class.
 
         Returns:
             int: The updated number of stocks the owner has after the operation. If the owner is removed, returns 0.
 
         Raises:
-            KeyError: If the name does not exist in self._owners.
+            KeyError: If the name does not exist in self._owners (or does not have stocks of the share class).
             RuntimeError: If the removal action would result in no owners left.
-            ValueError: If the number of stocks to be removed is negative or more than the total stocks owned by the owner.
+            ValueError: If the number of stocks to be removed is negative or more than the total stocks owned by the owner,
+                        or if stocks of another share class than the default one are removed without shrinking.
         """
+        if share_class not in (None, DEFAULT_SHARE_CLASS):
+            owner_current_stocks = self._share_classes.get(name, share_class)
+            if owner_current_stocks == 0:
+                raise KeyError(f"The owner {name} does not have {share_class} stocks")
+            if not shrink:
+                raise ValueError('Only the default share class can be rescaled, use shrink for the other classes')
+            if n_stocks is not None and n_stocks < 0:
+                raise ValueError("The number of stocks to be removed cannot be negative")
+            n_stocks = owner_current_stocks if n_stocks is None else min(n_stocks, owner_current_stocks)
+            owner_stocks = self._share_classes.add(name, share_class, -n_stocks)
+            if write_history:
+                self.add_to_history(f'Removing {share_class} stocks (shrink)', f'{name}: {owner_current_stocks} -> {owner_stocks}', external_description,
+                                    {'donor': name, 'amounts': {name: -n_stocks}, 'shrink': True, 'share_class': share_class})
+            return owner_stocks
 
         if name not in self._owners:
             raise KeyError(f"The owner {name} does not exist in owners")
@@ -415,12 +847,14 @@ class Company:
 
         action += ' (shrink)' if shrink else ' (no shrink)'
         if write_history:
-            self.add_to_history(action, f'{name}: {owner_current_stocks} -> {self._owners.get(name, 0)}',  external_description)
+            self.add_to_history(action, f'{name}: {owner_current_stocks} -> {self._owners.get(name, 0)}',  external_description,
+                                {'donor': name, 'amounts': {name: -n_stocks}, 'shrink': shrink})
 
         self._owners_cleanup()  # Cleans up the owners dict
 
         return self._owners.get(name, 0)
 
+    @_mutation(operation='remove_owner_percentage_absolute')
     def remove_owner_percentage_absolute(self, name:str, n_presentages:float=None, shrink=True, write_history=True, external_description:str='') -> int:
         """
         Removes an owner or reduces the number of stocks for the owner based on a percentage in absolute terms.
@@ -464,6 +898,7 @@ class Company:
 
         return removed_stocks
 
+    @_mutation(operation='remove_owner_percentage_relative')
     def remove_owner_percentage_relative(self, name:str, n_percentages:float=None, shrink=True, write_history=True, external_description:str='') -> int:
         """
         Removes an owner or reduces the number of stocks for the owner based on a percentage relative to the owner's current number of stocks.
@@ -506,7 +941,8 @@ class Company:
 
         
     ## Transfering stocks from one owner to another
-    def transfer_stocks(self, donor:str, receiver:str, n_stocks:int, write_history:bool=True, external_description:str='') -> int:
+    @_mutation(operation='transfer_stocks')
+    def transfer_stocks(self, donor:str, receiver:str, n_stocks:int, write_history:bool=True, external_description:str='', share_class:str=None) -> int:
         """
         Transfers stocks from one owner to another.
 
@@ -518,14 +954,28 @@ class Company:
             n_stocks (int): The number of stocks to be transferred.
             write_history (bool): Flag to decide if the action should be recorded in history.
             external_description (str): Additional notes about the action to be added to history.
+            share_class (str): The share class of the stocks, see define_share_class. None is the default class.
 
         Returns:
             int: The actual number of stocks transferred.
 
         Raises:
-            KeyError: If the donor does not exist in owners.
+            KeyError: If the donor does not exist in owners (or does not have stocks of the share class).
             RuntimeError: If the donor and reciver is the same.
         """
+        if share_class not in (None, DEFAULT_SHARE_CLASS):
+            donor_stocks = self._share_classes.get(donor, share_class)
+            if donor_stocks == 0:
+                raise KeyError(f"The donor {donor} does not have {share_class} stocks")
+            if donor == receiver:
+                raise RuntimeError(f"The donor and reciver cannot be the same owner ({donor}) ")
+            n_trans = min(n_stocks, donor_stocks)
+            self._share_classes.add(donor, share_class, -n_trans)
+            self._share_classes.add(receiver, share_class, n_trans)
+            if write_history:
+                self.add_to_history(f'Transfering {share_class} stocks', f'{donor} -[{n_trans}]-> {receiver}', external_description,
+                                    {'donor': donor, 'receiver': receiver, 'amounts': {donor: -n_trans, receiver: n_trans}, 'share_class': share_class})
+            return n_trans
 
         if donor not in self._owners:
             raise KeyError(f"The donor {donor} does not exist in owners")
@@ -544,12 +994,229 @@ class Company:
         self._owners_cleanup()  # Cleans up the owners dict
 
         if write_history:
-            self.add_to_history('Transfering stocks', f'{donor} -[{n_trans}]-> {receiver}', external_description)
+            self.add_to_history('Transfering stocks', f'{donor} -[{n_trans}]-> {receiver}', external_description,
+                                {'donor': donor, 'receiver': receiver, 'amounts': {donor: -n_trans, receiver: n_trans}})
 
         return n_trans
 
+    @_mutation(operation='distribute')
+    def distribute(self, donor:str, allocations:dict, policy:str='cap', write_history:bool=True, external_description:str='') -> dict:
+        """
+        Transfers stocks from one owner to many receivers at once, e.g. grants from a stock option pool.
+
+        All transfers are applied in one step and recorded as one event in the history.
+
+        Parameters:
+            donor (str): The name of the owner from whom the stocks are transferred.
+            allocations (dict): The receivers as keys and the number of stocks they should get as values.
+            policy (str): What to do if the donor does not have enough stocks:
+                          'cap' gives the receivers their stocks in order until the donor runs out,
+                          'pro_rata' reduces all allocations proportionally,
+                          'strict' raises a ValueError.
+            write_history (bool): Flag to decide if the action should be recorded in history.
+            external_description (str): Additional notes about the action to be added to history.
+
+        Returns:
+            dict: The number of stocks each receiver actually got.
+
+        Raises:
+            KeyError: If the donor does not exist in owners.
+            RuntimeError: If the donor is also a receiver.
+            ValueError: If the policy is unknown, an allocation is negative, or the donor has too few stocks with the 'strict' policy.
+        """
+        if donor not in self._owners:
+            raise KeyError(f"The donor {donor} does not exist in owners")
+
+        if donor in allocations:
+            raise RuntimeError(f"The donor and reciver cannot be the same owner ({donor}) ")
+
+        if policy not in ('cap', 'pro_rata', 'strict'):
+            raise ValueError(f"Unknown policy: {policy}. Use 'cap', 'pro_rata' or 'strict'")
+
+        if any(n_stocks < 0 for n_stocks in allocations.values()):
+            raise ValueError("The number of stocks to be distributed cannot be negative")
+
+        available = self._owners[donor]
+        requested = sum(allocations.values())
+
+        if requested <= available:
+            transfers = dict(allocations)
+        elif policy == 'strict':
+            raise ValueError(f'The donor does not have that many stocks: Desired = {requested}, Available = {available}')
+        elif policy == 'cap':
+            transfers = {}
+            remaining = available
+            for receiver, n_stocks in allocations.items():
+                transfers[receiver] = min(n_stocks, remaining)
+                remaining -= transfers[receiver]
+        else: # pro_rata, with the remainder going to the largest fractions so that exactly all the stocks are distributed
+            transfers = dict(zip(allocations, scale_stocks(list(allocations.values()), available)))
+
+        n_total = sum(transfers.values())
+        for receiver, n_stocks in transfers.items():
+            if n_stocks > 0:
+                self._owners[receiver] = self._owners.get(receiver, 0) + n_stocks
+
+        self._owners[donor] -= n_total
+        if self._owners[donor] == 0:
+            del self._owners[donor]
+
+        if write_history:
+            receivers_txt = ', '.join(f'{receiver}: {n_stocks}' for receiver, n_stocks in transfers.items())
+            self.add_to_history(f'Distributing stocks ({policy})', f'{donor} -[{n_total}]-> {receivers_txt}', external_description,
+                                {'donor': donor, 'amounts': {donor: -n_total, **transfers}})
+
+        return transfers
+
+
+    ## Funding rounds
+    @_mutation(operation='close_round')
+    def close_round(self, pre_money:float, investments:dict, convertibles:dict=None, pool_owner:str=None, pool_percentage:float=None,
+                    write_history:bool=True, external_description:str='') -> dict:
+        """
+        Closes a priced round: issues the stocks of the investors, converts SAFEs and notes, and tops up the option pool.
+
+        The price per stock is the pre-money valuation divided by the pre-money stocks, which include the conversions
+        and the pool top-up. All the new stocks are solved for at once (see rounds.solve_round) and added as one expansion.
+
+        Parameters:
+            pre_money (float): The pre-money valuation.
+            investments (dict): The investors as keys and the amount they invest as values.
+            convertibles (dict): The holders of convertibles as keys and their terms as values, as {'amount': float, 'cap': float, 'discount': float}.
+                                 The 'cap' is a pre-money valuation cap and the 'discount' a fraction (e.g. 0.2), both optional.
+            pool_owner (str): The name of the owner holding the option pool.
+            pool_percentage (float): The percentage of the company the pool should have after the round. It is only topped up, never reduced.
+            write_history (bool): Flag to decide if the action should be recorded in history.
+            external_description (str): Additional notes about the action to be added to history.
+
+        Returns:
+            dict: The number of new stocks of each investor, holder of convertibles and the pool owner.
+
+        Raises:
+            ValueError: If the pre-money valuation is not positive, an amount is negative, a pool percentage is given without a pool owner,
+                        or the convertibles and the pool would need the whole company.
+        """
+        convertibles = convertibles or {}
+        if pool_percentage is not None and pool_owner is None:
+            raise ValueError('A pool owner is needed to top up the pool')
+
+        if pool_percentage is not None and not 0 <= pool_percentage < 100:
+            raise ValueError('The pool percentage should be at least 0 and less than 100')
+
+        if any(amount < 0 for amount in investments.values()) or any(terms['amount'] < 0 for terms in convertibles.values()):
+            raise ValueError('The amounts cannot be negative')
+
+        price, new_stocks, _ = solve_round(self.number_of_stocks, pre_money, investments, convertibles,
+                                           self._owners.get(pool_owner, 0), pool_percentage)
+        if None in new_stocks:
+            new_stocks[pool_owner] = new_stocks.get(pool_owner, 0) + new_stocks.pop(None)
+
+        for name, n_stocks in new_stocks.items():
+            if n_stocks > 0:
+                self._owners[name] = self._owners.get(name, 0) + n_stocks
+
+        if write_history:
+            self.add_to_history('Closing round (expansion)',
+                                f'Price per stock: {price:.4f}, {sum(new_stocks.values())} new stocks to {len(new_stocks)} owners',
+                                external_description, {'amounts': new_stocks, 'expansion': True})
+
+        return new_stocks
+
+
+    ## Share classes
+    @_mutation
+    def define_share_class(self, share_class:str, voting:float=1.0, economic:float=1.0, outstanding:bool=True) -> None:
+        """
+        Defines a share class, or changes the weights of an existing one (also of the default class, 'common').
+
+        The stocks of the default class are the owners. The other classes are held in a matrix of owners x classes,
+        and are changed by passing 'share_class' to add_owner, add_owners, remove_owner and transfer_stocks.
+
+        Parameters:
+            share_class (str): The name of the class, e.g. 'preferred' or 'options'.
+            voting (float): The number of votes per stock.
+            economic (float): The economic weight per stock, e.g. the conversion ratio of preferred stocks.
+            outstanding (bool): If False, the stocks are only counted when fully diluted, e.g. options and warrants.
+
+        Raises:
+            ValueError: If a weight is negative.
+        """
+        if voting < 0 or economic < 0:
+            raise ValueError('The weights of a share class cannot be negative')
+        self._share_classes.define(share_class, voting, economic, outstanding)
+
+    @property
+    def share_classes(self) -> dict:
+        """
+        Get the share classes and their weights.
+
+        Returns:
+        dict: The classes as keys, and {'voting': float, 'economic': float, 'outstanding': bool} as values.
+        """
+        return {name: dict(definition) for name, definition in self._share_classes.classes.items()}
+
+    def holdings(self, share_class:str=None) -> dict:
+        """
+        Get the holdings of a share class.
+
+        Parameters:
+            share_class (str): The share class. None is the default class, the same as owners.
+
+        Returns:
+            dict: The owners of the class and their number of stocks.
+
+        Raises:
+            KeyError: If the share class is not defined.
+        """
+        if share_class in (None, DEFAULT_SHARE_CLASS):
+            return self.owners
+        return self._share_classes.holdings(share_class)
+
+    def _weighted_percentages(self, key:str) -> dict:
+        names, values = self._share_classes.weighted(self._owners, key)
+        total = values.sum()
+        if total == 0:
+            return {}
+        nonzero = values.nonzero()[0]
+        return dict(zip((names[i] for i in nonzero), (values[nonzero] / total * 100).tolist()))
+
+    def economic_percentages(self) -> dict:
+        """
+        Get the economic ownership of every owner, over the outstanding share classes weighted by their economic weights.
+
+        Returns:
+            dict: The owners and their economic percentage.
+        """
+        return self._weighted_percentages('economic')
+
+    def voting_percentages(self) -> dict:
+        """
+        Get the votes of every owner, over the outstanding share classes weighted by their voting weights.
+
+        Returns:
+            dict: The owners and their percentage of the votes.
+        """
+        return self._weighted_percentages('voting')
+
+    def fully_diluted(self, percentage:bool=False) -> dict:
+        """
+        Get the number of stocks of every owner over all share classes, including those that are not outstanding.
+
+        Parameters:
+            percentage (bool): If True, the percentages of the fully diluted total are returned instead.
+
+        Returns:
+            dict: The owners and their fully diluted number of stocks (or percentage).
+        """
+        names, values = self._share_classes.weighted(self._owners, outstanding_only=False)
+        nonzero = values.nonzero()[0]
+        if percentage:
+            return dict(zip((names[i] for i in nonzero), (values[nonzero] / values.sum() * 100).tolist()))
+        return dict(zip((names[i] for i in nonzero), values[nonzero].tolist()))
+
 
     ## History related functions
+    @_cached_query
     def owner_history(self, name:str, percentage:bool=True, fraction:bool=False) -> list[int|float]:
         """
         Retrieves the history of a specific owner.
@@ -585,6 +1252,7 @@ class Company:
 
         return owner_history
 
+    @_cached_query
     def history_dataframe(self, percentage:bool=True) -> pd.DataFrame:
         """
         Returns the history as a DataFrame.
@@ -601,6 +1269,8 @@ class Company:
         for history_dict in self.history:
             new_dict = history_dict.copy()  # To avoid modifying the original history_dict
             owners_dict = new_dict.pop('owners', {})  # Extract owners from the dictionary and remove the entry
+            new_dict.pop('operation', None)
+            new_dict.pop('fields', None)
 
             if percentage:
                 n_total_stocks = sum(owners_dict.values())
@@ -610,4 +1280,281 @@ class Company:
             new_dict.update(owners_dict)
             df_base.append(new_dict)
 
-        return pd.DataFrame(df_base)
\ No newline at end of file
+        return pd.DataFrame(df_base)
+
+    def iter_history(self, start:int=None, stop:int=None, fields=None, owners=None):
+        """
+        Iterates over the history without copying it, e.g. to stream a long history to a file.
+
+        Parameters:
+            start (int): The id of the first event. None starts at the beginning.
+            stop (int): The id the iteration stops before. None goes to the end.
+            fields (iterable): The keys of the events to include, e.g. ('id', 'event_type', 'owners'). None includes all of them.
+            owners (iterable): The owners to include in 'owners'. None includes all of them.
+
+        Returns:
+            A generator of read-only EventView, one per event.
+        """
+        history = self._history # The history is only appended to, or replaced, so this stays consistent
+        fields = tuple(fields) if fields is not None else None
+        owners = tuple(owners) if owners is not None else None
+        first = bisect_left(history, start, key=itemgetter('id')) if start is not None else 0
+        last = bisect_left(history, stop, key=itemgetter('id')) if stop is not None else len(history)
+        for position in range(first, last):
+            yield EventView(history[position], fields, owners)
+
+    @staticmethod
+    def _involved_owners(event:dict) -> set:
+        '''The owners involved in an event, according to its structured fields'''
+        fields = event.get('fields', {})
+        owners = set(fields.get('amounts', ()))
+        owners.update(fields[key] for key in ('donor', 'receiver') if key in fields)
+        return owners
+
+    def _index_keys(self, event:dict):
+        '''The indexes an event is in, with its key in each of them'''
+        yield self._event_type_index, event['event_type']
+        if 'operation' in event:
+            yield self._operation_index, event['operation']['op']
+        for name in self._involved_owners(event):
+            yield self._owner_index, name
+
+    def _index_history_event(self, event:dict) -> None:
+        '''Adds an event to the history indexes'''
+        owned = self._owned_index_lists
+        for index, key in self._index_keys(event):
+            events = index.get(key)
+            if events is None or (owned is not None and id(events) not in owned):
+                events = index[key] = [] if events is None else list(events) # Copy on write, see _trim_history_indexes
+                if owned is not None:
+                    owned.add(id(events))
+            events.append(event)
+
+    def _trim_history_indexes(self, position:int) -> None:
+        """
+        Removes the events from a position onward from the history indexes, before they are replayed.
+
+        The time used scales with the number of removed events. The indexes (and the lists of the keys changed by
+        the replay) are copied instead of changed, so that the old ones can be restored and snapshots can keep them.
+        """
+        removed = self._history[position:]
+        self._event_type_index, self._operation_index, self._owner_index = (
+            dict(self._event_type_index), dict(self._operation_index), dict(self._owner_index))
+        self._owned_index_lists = owned = set()
+        if not removed:
+            return
+        first_id = removed[0]['id']
+        for event in removed:
+            for index, key in self._index_keys(event):
+                events = index.get(key)
+                if events is None or id(events) in owned: # Already trimmed
+                    continue
+                events = events[:bisect_left(events, first_id, key=itemgetter('id'))]
+                if events:
+                    index[key] = events
+                    owned.add(id(events))
+                else:
+                    del index[key]
+
+    def _rebuild_history_indexes(self) -> None:
+        '''Rebuilds the history indexes, after the history has been replaced'''
+        self._event_type_index, self._operation_index, self._owner_index = {}, {}, {}
+        for event in self._history:
+            self._index_history_event(event)
+
+    def query_history(self, event_type:str=None, operation:str=None, owner:str=None, expansion:bool=None, description:str=None) -> list:
+        """
+        Finds the events in the history matching all the given filters.
+
+        The event type, operation and owner filters use indexes, so the time used is proportional to the number of
+        events matching the most selective of them. With only the other filters, the whole history is searched.
+
+        Parameters:
+            event_type (str): The type of the event, e.g. 'Transfering stocks'.
+            operation (str): The operation that wrote the event, e.g. 'transfer_stocks'.
+            owner (str): An owner involved in the event (as donor, receiver, or by getting or losing stocks).
+            expansion (bool): If the event was an expansion (or not).
+            description (str): A text that the description must contain.
+
+        Returns:
+            list: The matching events, in the order of the history.
+        """
+        candidates = [index.get(key, []) for index, key in ((self._event_type_index, event_type), (self._operation_index, operation), (self._owner_index, owner)) if key is not None]
+        events = min(candidates, key=len) if candidates else self._history
+
+        return [event for event in events
+                if (event_type is None or event['event_type'] == event_type)
+                and (operation is None or event.get('operation', {}).get('op') == operation)
+                and (owner is None or owner in self._involved_owners(event))
+                and (expansion is None or event.get('fields', {}).get('expansion') == expansion)
+                and (description is None or description in event['description'])]
+
+
+    ## Editing the history
+    def _history_position(self, event_id:int) -> int:
+        '''The position of an event in the history, by its id'''
+        position = bisect_left(self._history, event_id, key=itemgetter('id'))
+        if position == len(self._history) or self._history[position]['id'] != event_id:
+            raise KeyError(f"There is no event with id {event_id} in the history")
+        return position
+
+    def _apply_recorded_operation(self, operation:dict) -> None:
+        arguments = dict(operation)
+        op = arguments.pop('op')
+        if op == 'set_number_of_stocks':
+            self.number_of_stocks = arguments['number_of_stocks']
+        else:
+            getattr(self, op)(**arguments)
+
+    @_mutation
+    def _replay_history(self, position:int, operations:list) -> int:
+        """
+        Replaces the history from a position by the given operations, applied from the holdings just before it.
+
+        The holdings of the previous event are the checkpoint the replay starts from, so the time used scales with
+        the number of events after the position. If an operation fails, the company is left as it was.
+
+        Raises:
+            ValueError: If the company has other share classes, the holdings were changed without writing an event
+                        after the previous event, events just before the position were thinned by a compaction,
+                        or a later event cannot be replayed.
+        """
+        if self._share_classes.has_holdings():
+            raise ValueError('The history only has the holdings of the default share class, and cannot be replayed with other share classes')
+
+        if self._unrecorded_change is not None and (position == 0 or self._history[position - 1]['id'] <= self._unrecorded_change):
+            raise ValueError('The holdings were changed without writing an event (e.g. with write_history=False) after the event before the edited one, '
+                             'so the history cannot be replayed')
+
+        previous_id = self._history[position - 1]['id'] if position > 0 else -1
+        if position < len(self._history) and self._history[position]['id'] != previous_id + 1:
+            raise ValueError(f"The events before event {self._history[position]['id']} have been thinned by a compaction, "
+                             "so the holdings just before it are not known")
+
+        later = self._history[position + 1:]
+        for event in later:
+            if 'operation' not in event or event.get('n_events', 1) > 1:
+                raise ValueError(f"Event {event['id']} cannot be replayed, as it was not recorded as an operation or has been compacted")
+
+        owners, history = self._owners, self._history
+        indexes = self._event_type_index, self._operation_index, self._owner_index
+        checkpoint = self._history[position - 1]['owners'] if position > 0 else {}
+        self._trim_history_indexes(position)
+        self._owners = {name: stocks for name, stocks in checkpoint.items() if stocks > 0}
+        self._history = self._history[:position] # A new list, as snapshots of the history may share the old one
+        try:
+            for operation in operations:
+                self._apply_recorded_operation(operation)
+        except Exception:
+            self._owners, self._history = owners, history
+            self._event_type_index, self._operation_index, self._owner_index = indexes
+            raise
+        finally:
+            self._owned_index_lists = None
+
+        return len(operations)
+
+    @_mutation # The whole edit is one change, so other threads cannot change the history in the middle of it
+    def edit_event(self, event_id:int, **changes) -> int:
+        """
+        Changes the arguments of an earlier operation, and replays all the operations after it.
+
+        E.g. company.edit_event(3, n_percentages=12) if event 3 added an owner with 13%.
+        The edited and the later events get new ids.
+
+        Parameters:
+            event_id (int): The id of the event to edit.
+            **changes: The arguments of the operation to change.
+
+        Returns:
+            int: The number of operations that were replayed.
+
+        Raises:
+            KeyError: If there is no event with that id.
+            ValueError: If the event or a later event cannot be replayed (it has no operation, or has been compacted),
+                        or if the holdings were changed without writing an event after the event before it,
+                        or if the events just before it were thinned by a compaction.
+        """
+        position = self._history_position(event_id)
+        event = self._history[position]
+        if 'operation' not in event or event.get('n_events', 1) > 1:
+            raise ValueError(f"Event {event_id} cannot be edited, as it was not recorded as an operation or has been compacted")
+
+        operations = [{**event['operation'], **changes}] + [later.get('operation') for later in self._history[position + 1:]]
+        return self._replay_history(position, operations)
+
+    @_mutation
+    def delete_event(self, event_id:int) -> int:
+        """
+        Removes an earlier event, and replays all the operations after it.
+
+        Parameters:
+            event_id (int): The id of the event to delete.
+
+        Returns:
+            int: The number of operations that were replayed.
+
+        Raises:
+            KeyError: If there is no event with that id.
+            ValueError: If a later event cannot be replayed (it has no operation, or has been compacted),
+                        or if the holdings were changed without writing an event after the event before it,
+                        or if the events just before it were thinned by a compaction.
+        """
+        position = self._history_position(event_id)
+        operations = [later.get('operation') for later in self._history[position + 1:]]
+        return self._replay_history(position, operations)
+
+
+    ## Memory related functions
+    _index_attributes: tuple = ('_event_type_index', '_operation_index', '_owner_index') # Counted separately in memory_usage
+    _description_keys: tuple = ('event_type', 'description', 'external_description')
+
+    def memory_usage(self, deep:bool=True) -> dict:
+        """
+        Returns the memory used by the company, in bytes, broken down by what it is used for.
+
+        Parameters:
+            deep (bool): If True, everything that is contained is counted (names, numbers and texts), and objects 
+                         shared between the parts are counted once. If False, only the containers themselves are counted.
+
+        Returns:
+            dict: The bytes used by the 'owners' (current holdings), the 'history' (the events and their snapshots), 
+                  the 'descriptions' (the texts of the events), the 'indexes', and the 'total'.
+        """
+        if deep:
+            seen = set()
+            owners = _deep_sizeof(self._owners, seen)
+            descriptions = sum(_deep_sizeof(event.get(key), seen) for event in self._history for key in self._description_keys)
+            history = _deep_sizeof(self._history, seen)
+            indexes = sum(_deep_sizeof(getattr(self, name), seen) for name in self._index_attributes)
+        else:
+            owners = sys.getsizeof(self._owners)
+            descriptions = 0
+            history = sys.getsizeof(self._history) + sum(sys.getsizeof(event) + sys.getsizeof(event.get('owners', {})) for event in self._history)
+            indexes = sum(sys.getsizeof(getattr(self, name)) for name in self._index_attributes)
+
+        return {'owners': owners, 'history': history, 'descriptions': descriptions, 'indexes': indexes,
+                'total': owners + history + descriptions + indexes}
+
+    def projected_memory_usage(self, n_events:int) -> dict:
+        """
+        Projects the memory used by the company after a number of further events.
+
+        Every event stores a snapshot of the current holdings, so the growth per event is estimated from the
+        current number of owners and the average size of the rest of the most recent events.
+
+        Parameters:
+            n_events (int): The number of further events.
+
+        Returns:
+            dict: The estimated bytes added 'per_event', and the projected 'total'.
+        """
+        recent = self._history[-100:]
+        per_event = sys.getsizeof(dict(self._owners))
+        if recent:
+            seen = set()
+            _deep_sizeof(self._owners, seen) # The names and numbers are shared with the snapshots
+            per_event += sys.getsizeof(recent[-1])
+            per_event += sum(_deep_sizeof(value, seen) for event in recent for key, value in event.items() if key != 'owners') / len(recent)
+
+        return {'per_event': round(per_event), 'total': self.memory_usage(deep=True)['total'] + n_events * round(per_event)}
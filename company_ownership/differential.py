@@ -0,0 +1,119 @@
+import random
+import time
+from .company import Company
+from .operations import apply_operation
+
+# TO RUN: python -m company_ownership.differential
+
+def random_operations(n_operations:int, seed:int=None, n_names:int=20):
+    """
+    Generates a random sequence of operations covering every public mutating method of Company.
+
+    Some of the operations are invalid (e.g. removing an owner that does not exist), so that the
+    raised errors can be compared as well.
+
+    Parameters:
+        n_operations (int): The number of operations to generate.
+        seed (int): The seed of the random generator, for reproducibility.
+        n_names (int): The number of different owner names used.
+
+    Returns:
+        A generator of operations (see operations.apply_operation).
+    """
+    rng = random.Random(seed)
+    names = [f'Owner {i}' for i in range(n_names)]
+
+    def stocks():
+        return rng.choice((0, 1, rng.randint(1, 100), rng.randint(1, 10_000), rng.randint(1, 1_000_000)))
+
+    def percentage():
+        return rng.choice((rng.uniform(0.01, 5), rng.uniform(0.01, 60), rng.choice((0, 50, 100))))
+
+    generators = {
+        'add_owner': lambda: {'name': rng.choice(names), 'n_stocks': stocks(), 'expansion': rng.random() < 0.8},
+        'add_owners': lambda: {'new_owners': {name: stocks() for name in rng.sample(names, rng.randint(1, 4))}, 'expansion': rng.random() < 0.8},
+        'add_owner_percentage': lambda: {'name': rng.choice(names), 'n_percentages': percentage(), 'expansion': rng.random() < 0.5},
+        'add_owners_percentage': lambda: {'new_owners': {name: percentage() / 4 for name in rng.sample(names, rng.randint(1, 4))}, 'expansion': rng.random() < 0.5},
+        'remove_owner': lambda: {'name': rng.choice(names), 'n_stocks': rng.choice((None, stocks())), 'shrink': rng.random() < 0.5},
+        'remove_owner_percentage_absolute': lambda: {'name': rng.choice(names), 'n_presentages': rng.choice((None, percentage())), 'shrink': rng.random() < 0.5},
+        'remove_owner_percentage_relative': lambda: {'name': rng.choice(names), 'n_percentages': rng.choice((None, percentage())), 'shrink': rng.random() < 0.5},
+        'transfer_stocks': lambda: {'donor': rng.choice(names), 'receiver': rng.choice(names), 'n_stocks': stocks()},
+        'distribute': lambda: {'donor': rng.choice(names), 'allocations': {name: stocks() for name in rng.sample(names, rng.randint(1, 6))}, 'policy': rng.choice(('cap', 'pro_rata', 'strict'))},
+        'close_round': lambda: {'pre_money': rng.uniform(1e5, 1e8), 'investments': {name: rng.uniform(0, 1e7) for name in rng.sample(names, rng.randint(1, 3))},
+                                'convertibles': {rng.choice(names): {'amount': rng.uniform(0, 1e6), 'cap': rng.choice((None, rng.uniform(1e5, 1e8))), 'discount': rng.choice((0, 0.2))}},
+                                'pool_owner': rng.choice(names), 'pool_percentage': rng.choice((None, rng.uniform(0, 20)))},
+        'set_number_of_stocks': lambda: {'number_of_stocks': rng.randint(1, 10_000_000)},
+    }
+    ops = list(generators)
+    weights = [20, 5, 5, 3, 5, 3, 3, 20, 5, 1, 1]
+
+    for _ in range(n_operations):
+        op = rng.choices(ops, weights)[0]
+        yield {'op': op, **generators[op]()}
+
+def _apply(company:Company, operation:dict):
+    '''Applies an operation, returning the result or the type of the raised error'''
+    try:
+        return apply_operation(company, operation)
+    except Exception as e:
+        return type(e)
+
+def run_differential(engines:dict, n_operations:int=10_000, seed:int=None, n_names:int=20, check_history:bool=True) -> dict:
+    """
+    Runs the same random operations on the reference Company and on alternative engines, checking that they agree.
+
+    After every operation the return values (or raised error types) and the holdings are compared,
+    and at the end the full histories are compared.
+
+    Parameters:
+        engines (dict): The alternative engines, as {name: factory}. A factory takes the same arguments as Company.
+        n_operations (int): The number of random operations.
+        seed (int): The seed of the random generator, for reproducibility.
+        n_names (int): The number of different owner names used.
+        check_history (bool): If True, the histories are compared at the end.
+
+    Returns:
+        dict: {'operations': int, 'errors': int, 'ops_per_second': {engine name: float}} where 'errors' is the number of
+              operations that raised an error (identically) on all engines. The reference is named 'reference'.
+
+    Raises:
+        AssertionError: At the first difference between an engine and the reference.
+    """
+    factories = {'reference': Company, **engines}
+    companies = {name: factory('Differential', 'Owner 0', 1_000) for name, factory in factories.items()}
+    elapsed = dict.fromkeys(companies, 0.0)
+    reference = companies['reference']
+    n_errors = 0
+
+    for index, operation in enumerate(random_operations(n_operations, seed, n_names)):
+        results = {}
+        for name, company in companies.items():
+            start = time.perf_counter()
+            results[name] = _apply(company, operation)
+            elapsed[name] += time.perf_counter() - start
+
+        expected = results['reference']
+        n_errors += isinstance(expected, type)
+        for name, company in companies.items():
+            if results[name] != expected:
+                raise AssertionError(f"Operation {index} {operation}: '{name}' returned {results[name]!r}, the reference {expected!r}")
+            if company.owners != reference.owners:
+                raise AssertionError(f"Operation {index} {operation}: the holdings of '{name}' differ from the reference:\n{company.owners}\n{reference.owners}")
+
+    if check_history:
+        for name, company in companies.items():
+            history, reference_history = list(company.history), list(reference.history)
+            if history != reference_history:
+                difference = next((i for i, (a, b) in enumerate(zip(history, reference_history)) if a != b), min(len(history), len(reference_history)))
+                raise AssertionError(f"The history of '{name}' differs from the reference at event {difference}")
+
+    return {
+        'operations': n_operations,
+        'errors': n_errors,
+        'ops_per_second': {name: n_operations / seconds if seconds else float('inf') for name, seconds in elapsed.items()},
+    }
+
+if __name__ == '__main__':
+    report = run_differential({}, seed=0)
+    for name, ops_per_second in report['ops_per_second'].items():
+        print(f'{name}: {ops_per_second:,.0f} operations per second')
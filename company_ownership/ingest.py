@@ -0,0 +1,195 @@
+import asyncio
+import json
+import time
+from .company import Company
+from .operations import apply_operation
+
+class EventIngestor:
+    """
+    Applies a stream of events (operations, see operations.apply_operation) to a company with asyncio.
+
+    Events are put on a bounded queue, so producers wait when the company falls behind (backpressure).
+    The writer takes all queued events at once, up to 'max_batch', and coalesces runs of stock transfers
+    from the same donor into one Company.distribute, and runs of expanding add_owner into one add_owners.
+    The holdings are the same as when applying the events one by one, but a coalesced run is one event in the history.
+
+    Example:
+        ingestor = EventIngestor(company)
+        await ingestor.start()
+        await ingestor.consume(events) # Any async iterator of events
+        await ingestor.stop()
+    """
+    def __init__(self, company:Company, max_queue:int=1_000, max_batch:int=100, coalesce:bool=True) -> None:
+        '''
+        Parameters:
+        company (Company): The company to apply the events to.
+        max_queue (int): The number of events that can wait before producers are blocked.
+        max_batch (int): The maximum number of events applied in one batch.
+        coalesce (bool): If True, events of a batch that can be combined are applied as one operation.
+        '''
+        self.company = company
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+        self._started = None
+        self._received = 0
+        self._applied = 0
+        self._batches = 0
+        self._operations = 0
+        self._lag = 0.0
+        self.errors = [] # The events that failed, with their exception
+
+    async def put(self, event:dict) -> None:
+        '''Queues an event, waiting if the queue is full'''
+        await self._queue.put((time.perf_counter(), event))
+        self._received += 1
+
+    async def consume(self, events) -> None:
+        '''Queues all the events of an async iterator (or an asyncio.Queue, until it gives None)'''
+        if isinstance(events, asyncio.Queue):
+            while (event := await events.get()) is not None:
+                await self.put(event)
+        else:
+            async for event in events:
+                await self.put(event)
+
+    async def serve(self, host:str='127.0.0.1', port:int=0) -> asyncio.AbstractServer:
+        """
+        Accepts events as JSON lines over TCP. A slow company makes the connections stop reading (backpressure).
+        Lines that are not valid JSON are added to the errors, with the line as the event.
+
+        Returns:
+            asyncio.AbstractServer: The server, e.g. server.sockets[0].getsockname() gives the port.
+        """
+        async def handle(reader, writer):
+            try:
+                while line := await reader.readline():
+                    if line.strip():
+                        try:
+                            event = json.loads(line)
+                        except json.JSONDecodeError as e: # Recorded like a failed event, and the connection stays open
+                            self.errors.append((line, e))
+                            continue
+                        await self.put(event)
+            finally:
+                writer.close()
+        return await asyncio.start_server(handle, host, port)
+
+    async def start(self) -> None:
+        '''Starts applying the queued events'''
+        if self._task is None:
+            self._started = time.perf_counter()
+            self._task = asyncio.create_task(self._run())
+
+    async def join(self) -> None:
+        '''Waits until all queued events are applied'''
+        await self._queue.join()
+
+    async def stop(self) -> None:
+        '''Applies the queued events and stops'''
+        await self.join()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            events = [event for _, event in batch]
+            try:
+                self._apply(events)
+            except Exception as e: # The writer must keep running, or join and stop would wait forever
+                self.errors.extend((event, e) for event in events)
+            finally:
+                self._lag = max(time.perf_counter() - queued for queued, _ in batch)
+                self._applied += len(batch)
+                self._batches += 1
+                for _ in batch:
+                    self._queue.task_done()
+            await asyncio.sleep(0) # Lets the producers run
+
+    def _apply(self, events:list) -> None:
+        groups = self._coalesced(events) if self.coalesce else [[event] for event in events]
+        for group in groups:
+            if len(group) > 1:
+                try: # Both validate before changing anything, so a failure leaves the company as it was
+                    if group[0]['op'] == 'transfer_stocks':
+                        donor = group[0]['donor']
+                        allocations = {event['receiver']: event['n_stocks'] for event in group}
+                        if sum(allocations.values()) <= self.company.owners.get(donor, 0):
+                            self.company.distribute(donor, allocations, policy='strict')
+                            self._operations += 1
+                            continue
+                    else:
+                        self.company.add_owners({event['name']: event['n_stocks'] for event in group})
+                        self._operations += 1
+                        continue
+                except Exception:
+                    pass # Applied one by one below, so that every error is recorded with its event
+
+            for event in group: # One by one, e.g. when the donor runs out of stocks
+                try:
+                    apply_operation(self.company, event)
+                except Exception as e:
+                    self.errors.append((event, e))
+                self._operations += 1
+
+    @staticmethod
+    def _coalesced(events:list) -> list:
+        '''Groups events that give the same result when applied as one operation'''
+        groups = []
+        for event in events:
+            key = EventIngestor._coalesce_key(event)
+            previous = groups[-1] if groups else None
+            if key is not None and previous is not None and EventIngestor._coalesce_key(previous[0]) == key \
+                    and all(EventIngestor._target(other) != EventIngestor._target(event) for other in previous):
+                previous.append(event)
+            else:
+                groups.append([event])
+        return groups
+
+    @staticmethod
+    def _coalesce_key(event:dict):
+        '''Events with the same (not None) key can be combined, if they have different targets'''
+        if not isinstance(event, dict): # Applied on its own, where it fails and is recorded with its error
+            return None
+        if set(event) == {'op', 'donor', 'receiver', 'n_stocks'} and event['op'] == 'transfer_stocks' \
+                and event['donor'] != event['receiver'] and isinstance(event['n_stocks'], int) and event['n_stocks'] >= 0:
+            return ('transfer_stocks', event['donor'])
+        if event.get('op') == 'add_owner' and {'name', 'n_stocks'} <= set(event) <= {'op', 'name', 'n_stocks', 'expansion'} \
+                and isinstance(event['n_stocks'], int) and event['n_stocks'] >= 0 and event.get('expansion', True):
+            return ('add_owner',)
+        return None
+
+    @staticmethod
+    def _target(event:dict) -> str:
+        return event['receiver'] if event['op'] == 'transfer_stocks' else event['name']
+
+    def metrics(self) -> dict:
+        """
+        Get the throughput and lag of the ingestion.
+
+        Returns:
+            dict: The number of events 'received', 'applied' and 'queued', the number of 'batches' and of 'operations'
+                  applied to the company after coalescing, the 'errors', the 'throughput' in applied events per second
+                  since the start, and the 'lag', the time in seconds the oldest event of the last batch waited.
+        """
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            'received': self._received,
+            'applied': self._applied,
+            'queued': self._queue.qsize(),
+            'batches': self._batches,
+            'operations': self._operations,
+            'errors': len(self.errors),
+            'throughput': self._applied / elapsed if elapsed else 0.0,
+            'lag': self._lag,
+        }
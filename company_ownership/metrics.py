@@ -0,0 +1,163 @@
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+from .company import Company
+
+class MetricTracker(ABC):
+    """
+    Base class of metrics that are kept up to date with a company, using Company.subscribe.
+
+    After attaching, every change of the company updates the metric from the changed owners only, and
+    appends the company version and the new value to the time series 'versions' and 'values'.
+    """
+    def __init__(self) -> None:
+        self.versions = array('q')
+        self.values = array('d')
+        self._total = 0
+
+    def attach(self, company:Company) -> 'MetricTracker':
+        '''Starts tracking a company, from its current holdings'''
+        self._total = 0
+        self._update(company, {name: (0, stocks) for name, stocks in company.owners.items()})
+        company.subscribe(self._update)
+        return self
+
+    def detach(self, company:Company) -> None:
+        '''Stops tracking a company'''
+        company.unsubscribe(self._update)
+
+    def _update(self, company:Company, changes:dict) -> None:
+        self._total += sum(after - before for before, after in changes.values())
+        self.update(company, changes)
+        self.versions.append(company.version)
+        self.values.append(self.value)
+
+    @abstractmethod
+    def update(self, company:Company, changes:dict) -> None:
+        '''Updates the metric from the changed owners, as {name: (stocks before, stocks after)}'''
+
+    @property
+    @abstractmethod
+    def value(self) -> float:
+        '''The current value of the metric'''
+
+class ConcentrationTracker(MetricTracker):
+    '''The Herfindahl-Hirschman index (HHI) of the ownership, from 0 (spread out) to 10 000 (one owner)'''
+    def __init__(self) -> None:
+        super().__init__()
+        self._sum_of_squares = 0
+
+    def attach(self, company:Company) -> 'MetricTracker':
+        self._sum_of_squares = 0
+        return super().attach(company)
+
+    def update(self, company:Company, changes:dict) -> None:
+        self._sum_of_squares += sum(after * after - before * before for before, after in changes.values())
+
+    @property
+    def value(self) -> float:
+        return self._sum_of_squares / self._total ** 2 * 10_000 if self._total else 0.0
+
+class TopShareTracker(MetricTracker):
+    '''The combined percentage owned by the 'n' largest owners'''
+    def __init__(self, n:int=10) -> None:
+        super().__init__()
+        self.n = n
+        self._sorted = [] # The number of stocks of every owner, sorted
+
+    def attach(self, company:Company) -> 'MetricTracker':
+        self._sorted = []
+        return super().attach(company)
+
+    def update(self, company:Company, changes:dict) -> None:
+        for before, after in changes.values():
+            if before > 0:
+                del self._sorted[bisect_left(self._sorted, before)]
+            if after > 0:
+                insort(self._sorted, after)
+
+    @property
+    def value(self) -> float:
+        return sum(self._sorted[-self.n:]) / self._total * 100 if self._total else 0.0
+
+class GroupShareTracker(MetricTracker):
+    '''The combined percentage owned by a group of owners, e.g. the founders'''
+    def __init__(self, names) -> None:
+        super().__init__()
+        self.names = frozenset(names)
+        self._stocks = 0
+
+    def attach(self, company:Company) -> 'MetricTracker':
+        self._stocks = 0
+        return super().attach(company)
+
+    def update(self, company:Company, changes:dict) -> None:
+        self._stocks += sum(after - before for name, (before, after) in changes.items() if name in self.names)
+
+    @property
+    def value(self) -> float:
+        return self._stocks / self._total * 100 if self._total else 0.0
+
+class ThresholdTracker(MetricTracker):
+    """
+    Tracks the owners that cross ownership thresholds (in percentages), e.g. blocking or controlling stakes.
+
+    Every crossing is appended to 'crossings' as (version, name, threshold, crossed upwards). When the total number
+    of stocks changes, owners can cross a threshold without changing themselves, but only those with a number of
+    stocks between the threshold of the old and of the new total. The holdings are kept sorted, so an update looks
+    at the changed owners and those between the old and new thresholds only.
+    The value is the number of owners above the lowest threshold.
+    """
+    def __init__(self, thresholds=(33.4, 50, 66.7)) -> None:
+        super().__init__()
+        self.thresholds = sorted(thresholds)
+        self.crossings = []
+        self._levels = {} # The number of thresholds each owner above the lowest one is above
+        self._sorted = [] # (stocks, name) of every owner, sorted
+
+    def attach(self, company:Company) -> 'MetricTracker':
+        self._levels = {}
+        self._sorted = []
+        n_crossings = len(self.crossings)
+        super().attach(company)
+        del self.crossings[n_crossings:] # The starting point is not a crossing
+        return self
+
+    def _level(self, stocks:int) -> int:
+        percentage = stocks / self._total * 100 if self._total else 0.0
+        return sum(percentage >= threshold for threshold in self.thresholds)
+
+    def update(self, company:Company, changes:dict) -> None:
+        for name, (before, after) in changes.items():
+            if before > 0:
+                del self._sorted[bisect_left(self._sorted, (before, name))]
+            if after > 0:
+                insort(self._sorted, (after, name))
+
+        candidates = dict.fromkeys(changes) # Ordered, so the crossings are recorded in a stable order
+        old_total = self._total - sum(after - before for before, after in changes.values())
+        if old_total != self._total:
+            for threshold in self.thresholds:
+                low, high = sorted((threshold / 100 * old_total, threshold / 100 * self._total))
+                first = bisect_left(self._sorted, low, key=itemgetter(0))
+                last = bisect_right(self._sorted, high, key=itemgetter(0))
+                candidates.update(dict.fromkeys(name for _, name in self._sorted[first:last]))
+
+        owners = company.owners
+        for name in candidates:
+            old_level = self._levels.get(name, 0)
+            new_level = self._level(owners.get(name, 0))
+            if new_level == old_level:
+                continue
+            upwards = new_level > old_level
+            for i in range(min(old_level, new_level), max(old_level, new_level)):
+                self.crossings.append((company.version, name, self.thresholds[i], upwards))
+            if new_level:
+                self._levels[name] = new_level
+            else:
+                del self._levels[name]
+
+    @property
+    def value(self) -> float:
+        return float(len(self._levels))
@@ -0,0 +1,77 @@
+import inspect
+from .company import Company
+
+# The operations that can be described declaratively. All but 'set_number_of_stocks' are Company methods.
+OPERATIONS: tuple = (
+    'add_owner',
+    'add_owners',
+    'add_owner_percentage',
+    'add_owners_percentage',
+    'remove_owner',
+    'remove_owner_percentage_absolute',
+    'remove_owner_percentage_relative',
+    'transfer_stocks',
+    'distribute',
+    'close_round',
+    'set_number_of_stocks',
+)
+
+def set_number_of_stocks(company:Company, number_of_stocks:int) -> int:
+    '''Rescales the total number of stocks, the declarative version of the number_of_stocks setter'''
+    company.number_of_stocks = number_of_stocks
+    return company.number_of_stocks
+
+def create_company(operation:dict) -> Company:
+    '''
+    Creates a company from a 'company' operation, e.g. {"op": "company", "name": "Verres", "original_owner": "Idea", "n_stocks": 1000}.
+
+    Raises:
+        ValueError: If the operation is not a 'company' operation.
+    '''
+    arguments = dict(operation)
+    if arguments.pop('op', None) != 'company':
+        raise ValueError("The operation creating the company must have \"op\": \"company\"")
+    return Company(**arguments)
+
+_parameter_cache: dict = {}
+
+def _parameters(company:Company, op:str) -> frozenset:
+    '''The names of the parameters the function of an operation accepts'''
+    key = (type(company), op)
+    if key not in _parameter_cache:
+        function = set_number_of_stocks if op == 'set_number_of_stocks' else getattr(type(company), op)
+        _parameter_cache[key] = frozenset(inspect.signature(function).parameters)
+    return _parameter_cache[key]
+
+def apply_operation(company:Company, operation:dict, **defaults):
+    """
+    Applies one declarative operation to a company.
+
+    An operation is a dictionary with the name of the operation under 'op' and the arguments of the
+    corresponding Company method as the other keys, e.g. {"op": "transfer_stocks", "donor": "A", "receiver": "B", "n_stocks": 10}.
+
+    Parameters:
+        company (Company): The company to apply the operation to.
+        operation (dict): The operation.
+        **defaults: Arguments used when the operation does not give them and the method accepts them (e.g. write_history=False).
+
+    Returns:
+        The return value of the Company method.
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    arguments = dict(operation)
+    op = arguments.pop('op', None)
+    if op not in OPERATIONS:
+        raise ValueError(f"Unknown operation: {op}")
+
+    if defaults:
+        parameters = _parameters(company, op)
+        for key, value in defaults.items():
+            if key in parameters:
+                arguments.setdefault(key, value)
+
+    if op == 'set_number_of_stocks':
+        return set_number_of_stocks(company, **arguments)
+    return getattr(company, op)(**arguments)
@@ -0,0 +1,155 @@
+from .company import Company
+
+class Portfolio:
+    """
+    Many companies, with an index of what every owner holds in all of them.
+
+    The index maps each owner to the companies and the number of stocks they hold, and is kept up to date from the
+    changes of the companies (see Company.subscribe), so the queries only look at the companies of one owner.
+    Companies are identified by their name, which must be unique in the portfolio.
+
+    Example:
+        portfolio = Portfolio(companies)
+        portfolio.positions('Investor 1') # {company name: percentage}
+    """
+    def __init__(self, companies=()) -> None:
+        '''
+        Parameters:
+        companies (iterable): The companies to start with.
+        '''
+        self._companies: dict = {} # The companies by name
+        self._holdings: dict = {} # {owner: {company name: stocks}}
+        self._totals: dict = {} # The total number of stocks of each company
+        self._involved: dict = {} # {owner: set of the names of the companies they have ever held stocks in}
+        for company in companies:
+            self.add(company)
+
+    def __len__(self) -> int:
+        return len(self._companies)
+
+    def __iter__(self):
+        return iter(self._companies.values())
+
+    def __contains__(self, name:str) -> bool:
+        return name in self._companies
+
+    def __getitem__(self, name:str) -> Company:
+        return self._companies[name]
+
+    def add(self, company:Company) -> None:
+        """
+        Adds a company, and follows its changes.
+
+        Raises:
+            ValueError: If there already is a company with the same name.
+        """
+        if company.name in self._companies:
+            raise ValueError(f'There already is a company named {company.name} in the portfolio')
+        self._companies[company.name] = company
+        self._totals[company.name] = 0
+        for event in company.history: # Also the owners it had before
+            for name in event['owners']:
+                self._involved.setdefault(name, set()).add(company.name)
+        self._update(company, {name: (0, stocks) for name, stocks in company.owners.items()})
+        company.subscribe(self._update)
+
+    def remove(self, name:str) -> Company:
+        """
+        Removes a company, and stops following its changes.
+
+        Returns:
+            Company: The removed company.
+
+        Raises:
+            KeyError: If there is no company with the name.
+        """
+        company = self._companies.pop(name)
+        company.unsubscribe(self._update)
+        del self._totals[name]
+        for owner in list(self._involved):
+            self._involved[owner].discard(name)
+            if name in self._holdings.get(owner, {}):
+                del self._holdings[owner][name]
+                if not self._holdings[owner]:
+                    del self._holdings[owner]
+            if not self._involved[owner]:
+                del self._involved[owner]
+        return company
+
+    def _update(self, company:Company, changes:dict) -> None:
+        for owner, (before, after) in changes.items():
+            holdings = self._holdings.setdefault(owner, {})
+            if after > 0:
+                holdings[company.name] = after
+                self._involved.setdefault(owner, set()).add(company.name)
+            else:
+                holdings.pop(company.name, None)
+                if not holdings:
+                    del self._holdings[owner]
+            self._totals[company.name] += after - before
+
+    def owners(self) -> list:
+        '''All the current owners in the portfolio'''
+        return list(self._holdings)
+
+    def holdings(self, owner:str) -> dict:
+        """
+        Get the number of stocks an owner has in every company.
+
+        Returns:
+            dict: The names of the companies as keys and the number of stocks as values. Empty if the owner has no stocks.
+        """
+        return dict(self._holdings.get(owner, {}))
+
+    def positions(self, owner:str) -> dict:
+        """
+        Get the percentage an owner has of every company.
+
+        Returns:
+            dict: The names of the companies as keys and the percentages as values.
+        """
+        return {name: stocks / self._totals[name] * 100 for name, stocks in self._holdings.get(owner, {}).items()}
+
+    def exposure(self, owner:str, valuations:dict) -> float:
+        """
+        Get the value of the stocks of an owner in all companies.
+
+        Parameters:
+            owner (str): The name of the owner.
+            valuations (dict): The valuation of each company, by name.
+
+        Returns:
+            float: The sum of the owner's fraction of each company times its valuation.
+
+        Raises:
+            KeyError: If a company the owner has stocks in has no valuation.
+        """
+        return sum(stocks / self._totals[name] * valuations[name] for name, stocks in self._holdings.get(owner, {}).items())
+
+    def weighted_position(self, owner:str, weights:dict=None) -> float:
+        """
+        Get the average percentage an owner has of the companies in the portfolio, including those without stocks.
+
+        Parameters:
+            owner (str): The name of the owner.
+            weights (dict): The weight of each company by name, e.g. its valuation. Missing companies weigh 0.
+                            None weighs all the companies the same.
+
+        Returns:
+            float: The weighted average percentage.
+        """
+        if weights is None:
+            return sum(self.positions(owner).values()) / len(self._companies) if self._companies else 0.0
+        total_weight = sum(weights.get(name, 0) for name in self._companies)
+        if total_weight == 0:
+            return 0.0
+        return sum(percentage * weights.get(name, 0) for name, percentage in self.positions(owner).items()) / total_weight
+
+    def history(self, owner:str) -> dict:
+        """
+        Get the events of all companies that involve an owner, see Company.query_history.
+
+        Returns:
+            dict: The names of the companies the owner has ever held stocks in as keys, and lists of events as values.
+        """
+        return {name: self._companies[name].query_history(owner=owner) for name in sorted(self._involved.get(owner, ()))}
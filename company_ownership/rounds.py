@@ -0,0 +1,63 @@
+def solve_round(number_of_stocks:int, pre_money:float, investments:dict, convertibles:dict=None,
+                pool_stocks:int=0, pool_percentage:float=None) -> tuple[float, dict, int]:
+    """
+    Solves a priced round with convertible instruments and a pre-money option pool top-up in closed form.
+
+    The convertibles and the pool top-up are part of the pre-money stocks, so the price depends on them and they
+    depend on the price. Every new number of stocks is proportional to the pre-money number of stocks, which makes
+    the system linear, and it is solved in one step instead of by iterating.
+
+    Parameters:
+        number_of_stocks (int): The current total number of stocks.
+        pre_money (float): The pre-money valuation.
+        investments (dict): The new money, as {investor: amount}.
+        convertibles (dict): The converting instruments (SAFEs, notes), as {holder: {'amount': float, 'cap': float, 'discount': float}},
+                             where 'cap' (a pre-money valuation cap) and 'discount' (a fraction, e.g. 0.2) are optional.
+                             Notes should include their accrued interest in the amount.
+        pool_stocks (int): The current number of stocks in the option pool.
+        pool_percentage (float): The percentage of the company the pool should have after the round, if it should be topped up.
+
+    Returns:
+        tuple: The price per stock, the new stocks of each investor, holder and the pool (under None), and the pre-money number of stocks.
+
+    Raises:
+        ValueError: If the round is impossible, e.g. the convertibles and the pool would need the whole company.
+    """
+    if pre_money <= 0:
+        raise ValueError('The pre-money valuation must be positive')
+    convertibles = convertibles or {}
+
+    # The conversion stocks of each holder, per pre-money stock
+    conversion_ratios = {}
+    for holder, terms in convertibles.items():
+        valuation = pre_money * (1 - terms.get('discount', 0))
+        if terms.get('cap') is not None:
+            valuation = min(valuation, terms['cap'])
+        if valuation <= 0:
+            raise ValueError(f'The conversion valuation of {holder} must be positive')
+        conversion_ratios[holder] = terms['amount'] / valuation
+
+    investment_ratios = {investor: amount / pre_money for investor, amount in investments.items()}
+    conversion_ratio = sum(conversion_ratios.values())
+    post_ratio = 1 + sum(investment_ratios.values()) # Post-money stocks per pre-money stock
+    pool_fraction = (pool_percentage or 0) / 100
+
+    # pre = stocks + conversion_ratio * pre + max(0, pool_fraction * post_ratio * pre - pool_stocks)
+    if conversion_ratio >= 1:
+        raise ValueError('The convertibles would convert into the whole company')
+    pre_money_stocks = number_of_stocks / (1 - conversion_ratio) # Without a top-up
+    pool_top_up = 0.0
+    if pool_fraction * post_ratio * pre_money_stocks > pool_stocks: # The pool is too small
+        denominator = 1 - conversion_ratio - pool_fraction * post_ratio
+        if denominator <= 0:
+            raise ValueError('The convertibles and the pool would need the whole company')
+        pre_money_stocks = (number_of_stocks - pool_stocks) / denominator
+        pool_top_up = pool_fraction * post_ratio * pre_money_stocks - pool_stocks
+
+    new_stocks = {holder: round(ratio * pre_money_stocks) for holder, ratio in conversion_ratios.items()}
+    for investor, ratio in investment_ratios.items():
+        new_stocks[investor] = new_stocks.get(investor, 0) + round(ratio * pre_money_stocks)
+    if pool_top_up > 0:
+        new_stocks[None] = round(pool_top_up)
+
+    return pre_money / pre_money_stocks, new_stocks, round(pre_money_stocks)
@@ -0,0 +1,44 @@
+import numpy as np
+
+_INT64_MAX = int(np.iinfo(np.int64).max)
+_VECTORIZE_FROM = 32 # Below this number of owners, numpy costs more than it saves
+
+def scale_stocks(stocks:list, total:int) -> list:
+    """
+    Scales numbers of stocks proportionally to a new total, with exact integer arithmetic.
+
+    Every number gets the floor of its exact share of the total, and the stocks left over go one each to the
+    largest remainders (the earliest first on ties), so the result always adds up to the total. For many owners, and
+    products that fit in 64 bits, it is vectorized with numpy, otherwise Python integers keep it exact at any number of stocks.
+
+    Parameters:
+        stocks (list): The current numbers of stocks, not negative.
+        total (int): The total number of stocks to scale to.
+
+    Returns:
+        list: The scaled numbers of stocks, in the same order.
+
+    Raises:
+        ZeroDivisionError: If there are no stocks to scale.
+    """
+    current_total = sum(stocks)
+    if current_total == 0:
+        raise ZeroDivisionError("The current number of stocks is zero, scaling is impossible.")
+
+    if len(stocks) >= _VECTORIZE_FROM and max(stocks) * total <= _INT64_MAX and current_total <= _INT64_MAX:
+        products = np.array(stocks, dtype=np.int64) * total
+        scaled, remainders = np.divmod(products, current_total)
+        n_left = total - int(scaled.sum())
+        if n_left:
+            scaled[np.argsort(-remainders, kind='stable')[:n_left]] += 1
+        return scaled.tolist()
+
+    scaled, remainders = [], []
+    for n_stocks in stocks:
+        quotient, remainder = divmod(n_stocks * total, current_total)
+        scaled.append(quotient)
+        remainders.append(remainder)
+    n_left = total - sum(scaled)
+    for i in sorted(range(len(stocks)), key=remainders.__getitem__, reverse=True)[:n_left]:
+        scaled[i] += 1
+    return scaled
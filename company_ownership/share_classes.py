@@ -0,0 +1,151 @@
+import numpy as np
+
+DEFAULT_SHARE_CLASS = 'common' # Its holdings are Company.owners
+
+class ShareClassTable:
+    """
+    The holdings of the share classes other than the default one, as an owners x classes integer matrix.
+
+    Each class has a voting and an economic weight per stock, and is either outstanding (e.g. preferred stocks)
+    or only counted when fully diluted (e.g. options and warrants). Rows are only added, so the row of an owner
+    never changes, and the matrix grows by doubling.
+    """
+    def __init__(self) -> None:
+        self.classes: dict = {DEFAULT_SHARE_CLASS: {'voting': 1.0, 'economic': 1.0, 'outstanding': True}}
+        self.columns: list = [] # The classes in the matrix, in the order of the columns
+        self.names: list = [] # The owners, in the order of the rows
+        self._rows: dict = {}
+        self.stocks = np.zeros((0, 0), dtype=np.int64)
+
+    def copy(self) -> 'ShareClassTable':
+        table = ShareClassTable()
+        table.classes = {name: dict(definition) for name, definition in self.classes.items()}
+        table.columns = list(self.columns)
+        table.names = list(self.names)
+        table._rows = dict(self._rows)
+        table.stocks = self.stocks.copy()
+        return table
+
+    def define(self, share_class:str, voting:float, economic:float, outstanding:bool) -> None:
+        '''Adds a class, or changes the weights of an existing one'''
+        if share_class not in self.classes and share_class != DEFAULT_SHARE_CLASS:
+            self.columns.append(share_class)
+            self.stocks = np.hstack((self.stocks, np.zeros((self.stocks.shape[0], 1), dtype=np.int64)))
+        self.classes[share_class] = {'voting': voting, 'economic': economic, 'outstanding': outstanding}
+
+    def column(self, share_class:str) -> int:
+        '''
+        Raises:
+            KeyError: If the class is not defined.
+        '''
+        if share_class not in self.classes:
+            raise KeyError(f'The share class {share_class} is not defined')
+        return self.columns.index(share_class)
+
+    def get(self, name:str, share_class:str) -> int:
+        '''
+        Raises:
+            KeyError: If the class is not defined.
+        '''
+        column = self.column(share_class)
+        row = self._rows.get(name)
+        return 0 if row is None else int(self.stocks[row, column])
+
+    def _row(self, name:str) -> int:
+        '''The row of an owner, added if it is new'''
+        row = self._rows.get(name)
+        if row is None:
+            row = len(self.names)
+            if row == self.stocks.shape[0]:
+                self.stocks = np.vstack((self.stocks, np.zeros((max(row, 8), len(self.columns)), dtype=np.int64)))
+            self.names.append(name)
+            self._rows[name] = row
+        return row
+
+    def add(self, name:str, share_class:str, n_stocks:int) -> int:
+        """
+        Adds (or with a negative number, removes) stocks of a class to an owner.
+
+        Returns:
+            int: The number of stocks of the class the owner has afterwards.
+
+        Raises:
+            KeyError: If the class is not defined.
+            ValueError: If the owner would get a negative number of stocks.
+        """
+        column = self.column(share_class)
+        if n_stocks < 0 and name not in self._rows:
+            raise ValueError(f'{name} does not have that many {share_class} stocks')
+        row = self._row(name)
+        stocks = int(self.stocks[row, column]) + n_stocks
+        if stocks < 0:
+            raise ValueError(f'{name} does not have that many {share_class} stocks')
+        self.stocks[row, column] = stocks
+        return stocks
+
+    def add_many(self, amounts:dict, share_class:str) -> None:
+        """
+        Adds (or removes) stocks of a class to many owners, as one array operation.
+
+        Raises:
+            KeyError: If the class is not defined.
+            ValueError: If an owner would get a negative number of stocks. No holdings are changed then.
+        """
+        column = self.column(share_class)
+        values = np.fromiter(amounts.values(), dtype=np.int64, count=len(amounts))
+        new_names = [name for name in amounts if name not in self._rows]
+        if any(amounts[name] < 0 for name in new_names):
+            name = next(name for name in new_names if amounts[name] < 0)
+            raise ValueError(f'{name} does not have that many {share_class} stocks')
+
+        n_rows = len(self.names) + len(new_names)
+        if n_rows > self.stocks.shape[0]: # Grows once
+            n_rows = max(n_rows, 2 * self.stocks.shape[0], 8)
+            self.stocks = np.vstack((self.stocks, np.zeros((n_rows - self.stocks.shape[0], len(self.columns)), dtype=np.int64)))
+        self._rows.update(zip(new_names, range(len(self.names), len(self.names) + len(new_names))))
+        self.names.extend(new_names)
+
+        rows = np.fromiter(map(self._rows.__getitem__, amounts), dtype=np.int64, count=len(amounts))
+        result = self.stocks[rows, column] + values
+        if (result < 0).any():
+            name = next(name for name, stocks in zip(amounts, result) if stocks < 0)
+            raise ValueError(f'{name} does not have that many {share_class} stocks')
+        self.stocks[rows, column] = result
+
+    def holdings(self, share_class:str) -> dict:
+        '''The owners of a class and their number of stocks'''
+        values = self.stocks[:len(self.names), self.column(share_class)]
+        return {self.names[row]: int(values[row]) for row in np.flatnonzero(values)}
+
+    def has_holdings(self) -> bool:
+        return bool(self.stocks.any())
+
+    def weights(self, key:str, outstanding_only:bool) -> tuple[float, np.ndarray]:
+        '''The weight of the default class and of the columns, with the classes that do not count set to 0'''
+        def weight(definition):
+            if outstanding_only and not definition['outstanding']:
+                return 0.0
+            return 1.0 if key is None else definition[key]
+        return weight(self.classes[DEFAULT_SHARE_CLASS]), np.array([weight(self.classes[c]) for c in self.columns], dtype=np.float64)
+
+    def weighted(self, owners:dict, key:str=None, outstanding_only:bool=True) -> tuple[list, np.ndarray]:
+        """
+        Weighs the stocks of every owner over all classes, with one matrix-vector product.
+
+        Parameters:
+            owners (dict): The holdings of the default class.
+            key (str): The weight to use, 'voting' or 'economic'. None counts the stocks.
+            outstanding_only (bool): If True, the classes that are not outstanding are left out.
+
+        Returns:
+            tuple: The names and their weighted stocks (integers when counting).
+        """
+        dtype = np.int64 if key is None else np.float64 # Stock counts stay exact
+        default_weight, weights = self.weights(key, outstanding_only)
+        n_rows = len(self.names)
+        names = self.names + [name for name in owners if name not in self._rows]
+        values = np.zeros(len(names), dtype=dtype)
+        values[:n_rows] = self.stocks[:n_rows] @ weights.astype(dtype)
+        if default_weight:
+            values += dtype(default_weight) * np.fromiter((owners.get(name, 0) for name in names), dtype=dtype, count=len(names))
+        return names, values
@@ -0,0 +1,242 @@
+import os
+from array import array
+from bisect import bisect_left
+from multiprocessing import shared_memory, resource_tracker
+from .company import Company
+
+# Layout of the shared memory block. Everything is stored as 8 byte integers, except the names:
+#   header          [magic, publisher pid, n_names, n_names_bytes, n_current, n_events, n_entries, number_of_stocks]
+#   name_offsets    n_names + 1     Offsets of each (utf-8 encoded) name into the names, which are sorted
+#   names           n_names_bytes   Padded to a multiple of 8 bytes
+#   current_owner   n_current       The current owners (index into the names), in the order of Company.owners
+#   current_stocks  n_current       Their number of stocks
+#   event_offsets   n_events + 1    Offsets of each history event into the entries
+#   event_totals    n_events        The total number of stocks after each event
+#   entry_owner     n_entries       The owners of each event (index into the names)
+#   entry_stocks    n_entries       Their number of stocks
+_MAGIC = 0x434150544142 # 'CAPTAB'
+_HEADER_LENGTH = 8
+_ITEM_SIZE = 8
+
+def _padded(n_bytes:int) -> int:
+    return (n_bytes + _ITEM_SIZE - 1) // _ITEM_SIZE * _ITEM_SIZE
+
+class SharedCapTable:
+    """
+    A read-only view of the holdings and history of a Company, stored in shared memory.
+
+    One process publishes the company with 'SharedCapTable.publish', and any number of processes attach
+    to it by name with 'SharedCapTable.attach'. The readers work directly on the shared memory, so the
+    memory used per process does not grow with the size of the company.
+
+    The view is a snapshot: later changes of the company are not visible, publish it again instead.
+    """
+    def __init__(self, shm:shared_memory.SharedMemory) -> None:
+        '''Use SharedCapTable.publish or SharedCapTable.attach instead'''
+        self._shm = shm
+        self._views = []
+
+        header = self._view(0, _HEADER_LENGTH)
+        if header[0] != _MAGIC:
+            raise ValueError(f'{shm.name} is not a shared cap table')
+        _, self._publisher_pid, self._n_names, n_names_bytes, self._n_current, self._n_events, self._n_entries, self._number_of_stocks = header.tolist()
+
+        offset = _HEADER_LENGTH * _ITEM_SIZE
+        self._name_offsets = self._view(offset, self._n_names + 1)
+        offset += (self._n_names + 1) * _ITEM_SIZE
+        self._names = self._shm.buf[offset:offset + n_names_bytes].toreadonly()
+        self._views.append(self._names)
+        offset += _padded(n_names_bytes)
+        for attribute, length in (('_current_owner', self._n_current), ('_current_stocks', self._n_current),
+                                  ('_event_offsets', self._n_events + 1), ('_event_totals', self._n_events),
+                                  ('_entry_owner', self._n_entries), ('_entry_stocks', self._n_entries)):
+            setattr(self, attribute, self._view(offset, length))
+            offset += length * _ITEM_SIZE
+
+    def _view(self, offset:int, length:int) -> memoryview:
+        '''A read-only view of 'length' integers starting at 'offset' bytes'''
+        view = self._shm.buf[offset:offset + length * _ITEM_SIZE].cast('q').toreadonly()
+        self._views.append(view)
+        return view
+
+    @classmethod
+    def publish(cls, company:Company, name:str=None) -> 'SharedCapTable':
+        """
+        Publishes the current holdings and the history of a company into a new shared memory block.
+
+        The publishing process owns the block and should call 'unlink' when the readers are done with it.
+
+        Parameters:
+            company (Company): The company to publish.
+            name (str): The name of the shared memory block. A unique name is generated if not given.
+
+        Returns:
+            SharedCapTable: A view of the published company. Its 'name' is used to attach to it.
+
+        Raises:
+            OverflowError: If a number of stocks does not fit in a signed 64 bit integer.
+        """
+        names = set(company.owners)
+        for event in company.history:
+            names.update(event['owners'])
+        names = sorted(names, key=lambda owner: owner.encode('utf-8'))
+        index = {owner: i for i, owner in enumerate(names)}
+
+        encoded = [owner.encode('utf-8') for owner in names]
+        name_offsets = array('q', [0])
+        for owner in encoded:
+            name_offsets.append(name_offsets[-1] + len(owner))
+        names_bytes = b''.join(encoded)
+
+        current_owner = array('q', (index[owner] for owner in company.owners))
+        current_stocks = array('q', company.owners.values())
+
+        event_offsets = array('q', [0])
+        event_totals = array('q')
+        entry_owner = array('q')
+        entry_stocks = array('q')
+        for event in company.history:
+            owners = event['owners']
+            entry_owner.extend(index[owner] for owner in owners)
+            entry_stocks.extend(owners.values())
+            event_offsets.append(len(entry_owner))
+            event_totals.append(sum(owners.values()))
+
+        header = array('q', [_MAGIC, os.getpid(), len(names), len(names_bytes), len(current_owner),
+                             len(event_totals), len(entry_owner), company.number_of_stocks])
+        parts = [header.tobytes(), name_offsets.tobytes(), names_bytes.ljust(_padded(len(names_bytes)), b'\0')]
+        parts += [column.tobytes() for column in (current_owner, current_stocks, event_offsets, event_totals, entry_owner, entry_stocks)]
+        size = sum(len(part) for part in parts)
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        offset = 0
+        for part in parts:
+            shm.buf[offset:offset + len(part)] = part
+            offset += len(part)
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name:str) -> 'SharedCapTable':
+        """
+        Attaches to a published company, without copying it.
+
+        Parameters:
+            name (str): The name of the shared memory block.
+
+        Returns:
+            SharedCapTable: A read-only view of the company.
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        table = cls(shm)
+        if table._publisher_pid != os.getpid():
+            # Only the publisher should unlink the block, not the resource tracker of a reader when it exits
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return table
+
+    @property
+    def name(self) -> str:
+        '''The name of the shared memory block'''
+        return self._shm.name
+
+    def close(self) -> None:
+        '''Detaches from the shared memory. The view cannot be used afterwards.'''
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._shm.close()
+
+    def unlink(self) -> None:
+        '''Closes and frees the shared memory block. Should only be called by the publisher, when all readers are done.'''
+        self.close()
+        self._shm.unlink()
+
+    def __enter__(self) -> 'SharedCapTable':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self):
+        return f"SharedCapTable '{self.name}': {self._n_current} owner(s), {self._n_events} event(s)"
+
+    def _name(self, i:int) -> str:
+        return bytes(self._names[self._name_offsets[i]:self._name_offsets[i + 1]]).decode('utf-8')
+
+    def _index(self, name:str) -> int:
+        '''The index of a name, by binary search in the sorted names. Returns -1 if it is not there.'''
+        encoded = name.encode('utf-8')
+        i = bisect_left(range(self._n_names), encoded, key=lambda j: self._names[self._name_offsets[j]:self._name_offsets[j + 1]].tobytes())
+        if i < self._n_names and self._name(i) == name:
+            return i
+        return -1
+
+    @property
+    def owners(self) -> dict:
+        """
+        Get the current owners of the stocks.
+
+        Returns:
+            dict: A (new) dictionary of owners and their respective stocks.
+        """
+        return {self._name(i): stocks for i, stocks in zip(self._current_owner, self._current_stocks)}
+
+    @property
+    def number_of_stocks(self) -> int:
+        '''The total number of stocks'''
+        return self._number_of_stocks
+
+    def get_owner_percentage(self, name:str, multiplicator:float=100) -> float:
+        """
+        Returns the percentage of company stocks owned by a given owner.
+
+        Parameters:
+            name (str): The name of the owner.
+            multiplicator (float): The value by which the raw ownership ratio is multiplied. Default is 100 (i.e., ownership percentage).
+
+        Returns:
+            float: The percentage (or other scaled value) of stocks owned by the specified owner.
+
+        Raises:
+            KeyError: If the specified owner is not a current owner.
+            ZeroDivisionError: If the total number of stocks is 0.
+        """
+        i = self._index(name)
+        for owner, stocks in zip(self._current_owner, self._current_stocks):
+            if owner == i:
+                if self._number_of_stocks == 0:
+                    raise ZeroDivisionError("The company does not have any stocks.")
+                return stocks / self._number_of_stocks * multiplicator
+        raise KeyError(f"{name} is not an owner of this company.")
+
+    def owner_history(self, name:str, percentage:bool=True, fraction:bool=False) -> list[int|float]:
+        """
+        Retrieves the history of a specific owner, like Company.owner_history.
+
+        Parameters:
+            name (str): The name of the owner.
+            percentage (bool): Flag that decides whether the stock amount should be returned as a percentage. Defaults to True.
+            fraction (bool): Flag that decides whether the stock amount should be returned as a fraction of total stocks. Defaults to False.
+
+        Returns:
+            list: A list of the owner's history of stocks as counts, percentages, or fractions.
+
+        Raises:
+            KeyError: If the name does not exist in the history.
+        """
+        i = self._index(name)
+        multiplicator = 1 if fraction else 100
+        owner_history = []
+        entry_owner, entry_stocks, event_offsets = self._entry_owner, self._entry_stocks, self._event_offsets
+
+        if i >= 0:
+            for event in range(self._n_events):
+                start, stop = event_offsets[event], event_offsets[event + 1]
+                for entry in range(start, stop):
+                    if entry_owner[entry] == i:
+                        stock_count = entry_stocks[entry]
+                        owner_history.append(stock_count / self._event_totals[event] * multiplicator if percentage else stock_count)
+                        break
+
+        if not owner_history:
+            raise KeyError(f"{name} does not exist in history")
+        return owner_history
@@ -0,0 +1,142 @@
+import numpy as np
+from .company import Company
+
+class DilutionSimulator:
+    """
+    Forecasts the ownership of a company under uncertain future rounds, with a seeded Monte Carlo simulation.
+
+    Every path has a random number of rounds. In each round the option pool may first be refreshed, and then the
+    new investors take a random stake, both as add_owner_percentage with expansion, which scales everyone else by
+    (1 - stake). Many paths are simulated at once as a paths x owners array, and only a histogram of the final
+    percentages of each owner is kept, so the memory does not grow with the number of paths.
+
+    The results are reproducible for the same seed and batch size.
+
+    Example:
+        simulator = DilutionSimulator(company, n_rounds=(1, 4), stake=(10, 25), pool_owner='Stock Option Pool', seed=1)
+        simulator.run(1_000_000)
+        simulator.quantiles((5, 50, 95))['Founder']
+    """
+    def __init__(self, company:Company, n_rounds:tuple=(1, 3), stake:tuple=(10, 25), pool_owner:str=None,
+                 pool_refresh:float=0.5, pool_percentage:tuple=(5, 10), owners:list=None,
+                 investors:str='New investors', seed:int=None, bins:int=10_000) -> None:
+        '''
+        Parameters:
+        company (Company): The company at the start of every path.
+        n_rounds (tuple): The smallest and largest number of rounds of a path (uniform).
+        stake (tuple): The smallest and largest percentage the new investors take in a round (uniform).
+        pool_owner (str): The owner holding the option pool, if it should be refreshed.
+        pool_refresh (float): The probability that the pool is refreshed before a round.
+        pool_percentage (tuple): The smallest and largest percentage added to the pool in a refresh (uniform).
+        owners (list): The owners to follow. The rest are followed as one, 'Other owners'. None follows all of them.
+        investors (str): The name the new investors are followed as.
+        seed (int): The seed of the random numbers.
+        bins (int): The number of bins of the histograms of the percentages, which gives their resolution.
+        '''
+        followed = list(company.owners) if owners is None else list(owners)
+        if pool_owner is not None and pool_owner not in followed:
+            followed.append(pool_owner)
+        total = company.number_of_stocks
+        stocks = [company.owners.get(name, 0) for name in followed]
+        if sum(stocks) < total:
+            followed.append('Other owners')
+            stocks.append(total - sum(stocks))
+        start = [n_stocks / total for n_stocks in stocks]
+        followed.append(investors)
+        start.append(0.0)
+
+        self.owners = followed
+        self.n_rounds = n_rounds
+        self.stake = stake
+        self.pool_refresh = pool_refresh if pool_owner is not None else 0.0
+        self.pool_percentage = pool_percentage
+        self.bins = bins
+        self.n_paths = 0
+        self._start = np.array(start)
+        self._pool = followed.index(pool_owner) if pool_owner is not None else None
+        self._rng = np.random.default_rng(seed)
+        self._counts = np.zeros((len(followed), bins), dtype=np.int64)
+        self._sums = np.zeros(len(followed))
+
+    def run(self, n_paths:int, batch_size:int=10_000) -> 'DilutionSimulator':
+        """
+        Simulates more paths, adding them to the results.
+
+        Parameters:
+            n_paths (int): The number of paths to simulate.
+            batch_size (int): The number of paths simulated at once. The memory used is proportional to it.
+
+        Returns:
+            DilutionSimulator: Itself, so that the results can be read directly.
+        """
+        while n_paths > 0:
+            n = min(n_paths, batch_size)
+            self._add(self._simulate(n))
+            n_paths -= n
+        return self
+
+    def _simulate(self, n:int) -> np.ndarray:
+        '''The final fractions of n paths, as a paths x owners array'''
+        rng = self._rng
+        fractions = np.tile(self._start, (n, 1))
+        n_rounds = rng.integers(self.n_rounds[0], self.n_rounds[1] + 1, n)
+        investors = len(self.owners) - 1
+        for step in range(self.n_rounds[1]):
+            active = step < n_rounds
+            if self._pool is not None:
+                refresh = active & (rng.random(n) < self.pool_refresh)
+                top_up = np.where(refresh, rng.uniform(*self.pool_percentage, n) / 100, 0.0)
+                fractions *= (1 - top_up)[:, None]
+                fractions[:, self._pool] += top_up
+            stake = np.where(active, rng.uniform(*self.stake, n) / 100, 0.0)
+            fractions *= (1 - stake)[:, None]
+            fractions[:, investors] += stake
+        return fractions
+
+    def _add(self, fractions:np.ndarray) -> None:
+        n_owners = len(self.owners)
+        bins = np.minimum((fractions * self.bins).astype(np.int64), self.bins - 1)
+        bins += np.arange(n_owners) * self.bins # One histogram per owner, counted in one go
+        self._counts += np.bincount(bins.ravel(), minlength=n_owners * self.bins).reshape(n_owners, self.bins)
+        self._sums += fractions.sum(axis=0)
+        self.n_paths += len(fractions)
+
+    def quantiles(self, quantiles=(5, 25, 50, 75, 95)) -> dict:
+        """
+        Get quantiles of the final percentage of every owner, interpolated within the bins of the histograms.
+
+        Parameters:
+            quantiles (tuple): The quantiles, in percentages.
+
+        Returns:
+            dict: The owners as keys, and dictionaries of {quantile: percentage} as values.
+
+        Raises:
+            RuntimeError: If no paths have been simulated.
+        """
+        if self.n_paths == 0:
+            raise RuntimeError('No paths have been simulated, use run first')
+        width = 100 / self.bins
+        result = {}
+        for name, counts in zip(self.owners, self._counts):
+            cumulative = np.cumsum(counts)
+            values = {}
+            for quantile in quantiles:
+                target = quantile / 100 * self.n_paths
+                i = min(int(np.searchsorted(cumulative, target)), self.bins - 1)
+                below = cumulative[i - 1] if i > 0 else 0
+                inside = (target - below) / counts[i] if counts[i] else 0.0
+                values[quantile] = float((i + inside) * width)
+            result[name] = values
+        return result
+
+    def mean(self) -> dict:
+        """
+        Get the mean final percentage of every owner.
+
+        Returns:
+            dict: The owners and their mean percentage.
+        """
+        if self.n_paths == 0:
+            raise RuntimeError('No paths have been simulated, use run first')
+        return dict(zip(self.owners, (self._sums / self.n_paths * 100).tolist()))
@@ -0,0 +1,150 @@
+import threading
+from bisect import bisect_left
+from functools import wraps
+from operator import itemgetter
+from .company import Company
+
+class CompanySnapshot(Company):
+    """
+    A consistent, read-only version of a ThreadSafeCompany.
+
+    It supports all the reading methods of Company, and stays the same however the company changes afterwards.
+    """
+    def __init__(self, company:Company) -> None:
+        '''Use ThreadSafeCompany.snapshot instead'''
+        self.name = company.name
+        self._owners = company._owners
+        self._history = company._history
+        self._n_events = len(company._history)
+        self._history_retention = company._history_retention
+        self._mutation_depth = 0
+        self._version = company._version
+        self._subscribers = []
+        self._owners_before = None
+        self._operation = None
+        self._event_type_index = company._event_type_index
+        self._operation_index = company._operation_index
+        self._owner_index = company._owner_index
+        self._share_classes = company._share_classes
+        self._query_cache = None
+        self._number_of_stocks = sum(company._owners.values())
+
+    def _begin_mutation(self) -> None:
+        raise TypeError('A snapshot of a company is read only')
+
+    @property
+    def history(self) -> list:
+        '''The history up to the snapshot'''
+        return self._history[:self._n_events]
+
+    @property
+    def number_of_stocks(self) -> int:
+        '''The total number of stocks'''
+        return self._number_of_stocks
+
+    def iter_history(self, start:int=None, stop:int=None, fields=None, owners=None):
+        '''Iterates over the history up to the snapshot, see Company.iter_history'''
+        last_id = self._history[self._n_events - 1]['id'] if self._n_events else -1
+        stop = last_id + 1 if stop is None else min(stop, last_id + 1)
+        return super().iter_history(start, stop, fields, owners)
+
+    def query_history(self, *args, **kwargs) -> list:
+        '''Finds the events in the history up to the snapshot, see Company.query_history'''
+        # The indexes may be shared with the company, which can reuse the ids of edited events, so each event is
+        # looked up in the history of the snapshot
+        def in_snapshot(event):
+            position = bisect_left(self._history, event['id'], 0, self._n_events, key=itemgetter('id'))
+            return position < self._n_events and self._history[position] is event
+        return [event for event in super().query_history(*args, **kwargs) if in_snapshot(event)]
+
+def _read_from_snapshot(method):
+    '''Makes a reading method use the latest snapshot, unless it is called by the writer in the middle of a change'''
+    @wraps(method)
+    def reader(self, *args, **kwargs):
+        if self._writer == threading.get_ident():
+            return method(self, *args, **kwargs)
+        return method(self._snapshot, *args, **kwargs)
+    return reader
+
+class ThreadSafeCompany(Company):
+    """
+    A Company that can be read by many threads while it is changed.
+
+    Changes are serialized by a lock, and are made on a copy of the holdings, which is published as a new
+    snapshot when the change is done. Readers never wait for a writer: they read from the latest snapshot,
+    which is consistent and never changes. Use 'snapshot' to do several reads on the same version.
+
+    The owners returned to readers are the ones of the snapshot, and must not be modified.
+    """
+    _thread_safe = True
+
+    def __init__(self, name:str, original_owner:str=None, n_stocks:int=100) -> None:
+        '''
+        Initiate a new company with its name, the original owner, and the number of stocks.
+
+        Parameters:
+        name (str): The name of the company.
+        original_owner (str): The name of the original owner of the company.
+        n_stocks (int): The number of stocks the original owner has.
+        '''
+        self._lock = threading.RLock()
+        self._writer = None
+        self._snapshot = None
+        super().__init__(name, original_owner, n_stocks)
+        if self._snapshot is None:
+            self._snapshot = CompanySnapshot(self)
+
+    def _begin_mutation(self) -> None:
+        self._lock.acquire()
+        if self._mutation_depth == 0:
+            self._writer = threading.get_ident()
+            self._owners = dict(self._owners) # The published holdings are never changed
+            self._share_classes = self._share_classes.copy()
+        super()._begin_mutation()
+
+    def _end_mutation(self) -> None:
+        try:
+            super()._end_mutation()
+        finally:
+            if self._mutation_depth == 0:
+                self._snapshot = CompanySnapshot(self)
+                self._writer = None
+            self._lock.release()
+
+    def snapshot(self) -> CompanySnapshot:
+        """
+        Get the latest consistent version of the company, without waiting for a writer.
+
+        Returns:
+            CompanySnapshot: A read-only company.
+        """
+        return self._snapshot
+
+    owners = property(_read_from_snapshot(Company.owners.fget), Company.owners.fset)
+    history = property(_read_from_snapshot(Company.history.fget), Company.history.fset)
+    number_of_stocks = property(_read_from_snapshot(Company.number_of_stocks.fget), Company.number_of_stocks.fset)
+    version = property(_read_from_snapshot(Company.version.fget))
+
+    __repr__ = _read_from_snapshot(Company.__repr__)
+    __str__ = _read_from_snapshot(Company.__str__)
+    _ordered_owner_dict = _read_from_snapshot(Company._ordered_owner_dict)
+    _get_owner_percentage = _read_from_snapshot(Company._get_owner_percentage)
+    owner_history = _read_from_snapshot(Company.owner_history)
+    history_dataframe = _read_from_snapshot(Company.history_dataframe)
+    share_classes = property(_read_from_snapshot(Company.share_classes.fget))
+    holdings = _read_from_snapshot(Company.holdings)
+    economic_percentages = _read_from_snapshot(Company.economic_percentages)
+    voting_percentages = _read_from_snapshot(Company.voting_percentages)
+    fully_diluted = _read_from_snapshot(Company.fully_diluted)
+
+    def query_history(self, *args, **kwargs) -> list:
+        '''Finds the events in the history, see Company.query_history'''
+        if self._writer == threading.get_ident():
+            return super().query_history(*args, **kwargs)
+        return self._snapshot.query_history(*args, **kwargs)
+    def iter_history(self, *args, **kwargs):
+        '''Iterates over the history, see Company.iter_history'''
+        if self._writer == threading.get_ident():
+            return super().iter_history(*args, **kwargs)
+        return self._snapshot.iter_history(*args, **kwargs)
+    memory_usage = _read_from_snapshot(Company.memory_usage)
@@ -12,5 +12,14 @@ setup(
     packages=find_packages(exclude=['tests']), 
     install_requires=[
         "pandas",
+        "numpy",
     ],
+    extras_require={
+        "yaml": ["pyyaml"],
+    },
+    entry_points={
+        "console_scripts": [
+            "company-ownership=company_ownership.cli:main",
+        ],
+    },
 )
\ No newline at end of file
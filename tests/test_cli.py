@@ -0,0 +1,72 @@
+import io
+import json
+import pytest
+from company_ownership.cli import main, replay, iter_operations
+from company_ownership import cli
+
+OPERATIONS = [
+    {'op': 'company', 'name': 'Test', 'original_owner': 'Test Owner 1', 'n_stocks': 100},
+    {'op': 'add_owner', 'name': 'Stock Option Pool', 'n_stocks': 100},
+    {'op': 'transfer_stocks', 'donor': 'Stock Option Pool', 'receiver': 'Test Owner 2', 'n_stocks': 50},
+    {'op': 'add_owner_percentage', 'name': 'Investor', 'n_percentages': 20},
+    {'op': 'set_number_of_stocks', 'number_of_stocks': 1000},
+]
+
+def test_replay():
+    output = io.StringIO()
+    company, timings = replay(OPERATIONS, snapshot_every=2, final_snapshot=True, output=output)
+    assert company.owners == {'Test Owner 1': 400, 'Stock Option Pool': 200, 'Test Owner 2': 200, 'Investor': 200}
+    assert len(company.history) == 5
+    assert timings['transfer_stocks']['count'] == 1
+
+    snapshots = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [snapshot['operations'] for snapshot in snapshots] == [2, 4, 4]
+    assert snapshots[-1]['number_of_stocks'] == 1000
+
+    # Without history
+    company, _ = replay(OPERATIONS[:4], write_history=False)
+    assert len(company.history) == 1 # Only the creation of the company
+
+    # Unknown operations and missing company
+    with pytest.raises(ValueError):
+        replay(OPERATIONS[:1] + [{'op': 'drop_table'}])
+    with pytest.raises(ValueError):
+        replay(OPERATIONS[1:])
+
+def test_iter_json(monkeypatch):
+    monkeypatch.setattr(cli, '_CHUNK_SIZE', 7) # Forces operations to span several chunks
+    text = json.dumps(OPERATIONS, indent=2)
+    assert list(iter_operations(io.StringIO(text), 'json')) == OPERATIONS
+
+    with pytest.raises(ValueError):
+        list(iter_operations(io.StringIO(text[:-10]), 'json'))
+    with pytest.raises(ValueError):
+        list(iter_operations(io.StringIO('{"op": "add_owner"}'), 'json'))
+    assert list(iter_operations(io.StringIO('[ ]'), 'json')) == []
+    for text in ('[{"op": 1} {"op": 2}]', '[,,{"op": 1},,]', '[{"op": 1},]', '[{"op": 1},, {"op": 2}]'):
+        with pytest.raises(ValueError):
+            list(iter_operations(io.StringIO(text), 'json'))
+
+def test_main(tmp_path, capsys):
+    path = tmp_path / 'scenario.jsonl'
+    path.write_text('\n'.join(json.dumps(operation) for operation in OPERATIONS))
+    timings_path = tmp_path / 'timings.csv'
+
+    assert main([str(path), '--final-snapshot', '--timings', '--timings-file', str(timings_path)]) == 0
+    captured = capsys.readouterr()
+    assert json.loads(captured.out)['owners']['Investor'] == 200
+    assert 'transfer_stocks' in captured.err
+    assert len(timings_path.read_text().splitlines()) == 5
+
+    # Errors in the operations are reported, not raised
+    path.write_text(json.dumps({'op': 'remove_owner', 'name': 'Nobody'}))
+    assert main([str(path), '--name', 'Test', '--original-owner', 'Test Owner 1']) == 1
+    assert capsys.readouterr().err == 'company-ownership: error: Operation 0 (remove_owner): The owner Nobody does not exist in owners\n'
+
+    # Also unknown arguments and failed assertions
+    path.write_text('\n'.join(json.dumps(operation) for operation in OPERATIONS[:2] + [{'op': 'add_owner', 'name': 'A', 'stocks': 1}]))
+    assert main([str(path)]) == 1
+    assert capsys.readouterr().err.startswith('company-ownership: error: Operation 2 (add_owner): ')
+    path.write_text('\n'.join(json.dumps(operation) for operation in OPERATIONS[:2] + [{'op': 'set_number_of_stocks', 'number_of_stocks': -1}]))
+    assert main([str(path)]) == 1
+    assert 'Operation 2 (set_number_of_stocks)' in capsys.readouterr().err
@@ -255,6 +255,42 @@ def test_transfer_stocks(company: Company):
     with pytest.raises(RuntimeError):
         company.transfer_stocks(donor='Test Owner 2', receiver='Test Owner 2', n_stocks=50)
 
+def test_distribute():
+    company = Company(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    company.add_owner(name='Stock Option Pool', n_stocks=100)
+
+    # Enough stocks in the pool
+    transfers = company.distribute('Stock Option Pool', {'Test Owner 2': 30, 'Test Owner 3': 20})
+    assert transfers == {'Test Owner 2': 30, 'Test Owner 3': 20}
+    assert company.owners['Stock Option Pool'] == 50
+    assert len(company.history) == 3
+    assert company.history[-1]['description'] == 'Stock Option Pool -[50]-> Test Owner 2: 30, Test Owner 3: 20'
+
+    # Too few stocks
+    with pytest.raises(ValueError):
+        company.distribute('Stock Option Pool', {'Test Owner 2': 30, 'Test Owner 3': 30}, policy='strict')
+    assert company.owners['Stock Option Pool'] == 50
+
+    transfers = company.distribute('Stock Option Pool', {'Test Owner 2': 20, 'Test Owner 3': 20, 'Test Owner 4': 20}, policy='pro_rata')
+    assert transfers == {'Test Owner 2': 17, 'Test Owner 3': 17, 'Test Owner 4': 16}
+    assert 'Stock Option Pool' not in company.owners
+    assert company.number_of_stocks == 200
+
+    company.add_owner(name='Stock Option Pool', n_stocks=10)
+    transfers = company.distribute('Stock Option Pool', {'Test Owner 2': 8, 'Test Owner 3': 8, 'Test Owner 4': 8}, policy='cap')
+    assert transfers == {'Test Owner 2': 8, 'Test Owner 3': 2, 'Test Owner 4': 0}
+    assert company.owners['Test Owner 4'] == 16
+
+    # Invalid distributions
+    with pytest.raises(KeyError):
+        company.distribute('Stock Option Pool', {'Test Owner 2': 1})
+    with pytest.raises(RuntimeError):
+        company.distribute('Test Owner 1', {'Test Owner 1': 1})
+    with pytest.raises(ValueError):
+        company.distribute('Test Owner 1', {'Test Owner 2': 1}, policy='random')
+    with pytest.raises(ValueError):
+        company.distribute('Test Owner 1', {'Test Owner 2': -1})
+
 
 ## Testing history funcitons
 def test_owner_history():
@@ -280,4 +316,267 @@ def test_owner_history():
 
     # Test for non-existing owner
     with pytest.raises(KeyError):
-        company.owner_history('Non-existing Owner')
\ No newline at end of file
+        company.owner_history('Non-existing Owner')
+
+## Testing history retention
+def test_compact_history():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Test Owner 1')
+    company.add_owner(name='Stock Option Pool', n_stocks=10_000)
+    for i in range(10):
+        company.transfer_stocks('Stock Option Pool', f'Employee {i}', 100)
+    company.add_owner(name='Investor', n_stocks=5_000)
+    company.add_owner(name='Investor', n_stocks=5_000)
+    owners = dict(company.owners)
+
+    # Nothing is compacted before a retention is set
+    assert company.compact_history() == 0
+    assert len(company.history) == 14
+
+    # Merging the consecutive transfers, keeping the last two events
+    company.set_history_retention(keep_last=2)
+    reclaimed = company.compact_history()
+    assert reclaimed > 0
+    assert [event['event_type'] for event in company.history] == ['Adding new owner (expansion)', 'Transfering stocks', 'Adding new owner (expansion)', 'Adding stocks to owner (expansion)']
+    assert company.history[1]['n_events'] == 10
+    assert company.history[1]['owners']['Employee 9'] == 100
+    assert company.owners == owners
+
+    # Thinning to checkpoints
+    company.set_history_retention(keep_last=1, checkpoint_every=2, merge_consecutive=False)
+    company.compact_history()
+    assert [event['id'] for event in company.history] == [1, 12, 13]
+
+    # Ids stay unique after compaction
+    company.add_owner(name='Investor', n_stocks=1)
+    assert company.history[-1]['id'] == 14
+
+    # Only in the background for a ThreadSafeCompany
+    with pytest.raises(RuntimeError):
+        company.compact_history(background=True)
+
+    with pytest.raises(ValueError):
+        company.set_history_retention(checkpoint_every=0)
+
+
+## Testing memory usage
+def test_memory_usage():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Test Owner 1')
+    for i in range(20):
+        company.add_owner(name=f'Test Owner {i}', n_stocks=100)
+
+    usage = company.memory_usage()
+    assert set(usage) == {'owners', 'history', 'descriptions', 'indexes', 'total'}
+    assert usage['total'] == usage['owners'] + usage['history'] + usage['descriptions'] + usage['indexes']
+    assert usage['owners'] > 0 and usage['history'] > usage['owners'] and usage['descriptions'] > 0
+    assert company.memory_usage(deep=False)['total'] < usage['total']
+
+    # The projection should be close to the actual growth
+    projection = company.projected_memory_usage(10)
+    for i in range(10):
+        company.add_owner(name='Test Owner 1', n_stocks=100)
+    assert abs(projection['total'] - company.memory_usage()['total']) < 0.2 * 10 * projection['per_event']
+
+
+## Testing editing of the history
+def test_edit_event():
+    def scenario(startup_lab_percentage, transfer=True):
+        c = Company(name='Test', n_stocks=10_000, original_owner='Idea')
+        c.add_owners_percentage({'Johannes': 30, 'Sara': 30}, expansion=False)
+        c.add_owner(name='Stock Option Pool', n_stocks=2_000)
+        c.add_owner_percentage('StartupLab', startup_lab_percentage, expansion=True)
+        if transfer:
+            c.transfer_stocks('Stock Option Pool', 'Sara', 500)
+        c.remove_owner_percentage_relative('Idea', 50, shrink=False)
+        c.number_of_stocks = 100_000
+        return c
+
+    company = scenario(13)
+    assert company.history[3]['operation'] == {'op': 'add_owner_percentage', 'name': 'StartupLab', 'n_percentages': 13, 'expansion': True}
+
+    # Changing the percentage replays the events after it
+    assert company.edit_event(3, n_percentages=12) == 4
+    expected = scenario(12)
+    assert company.owners == expected.owners
+    assert company.history == expected.history
+
+    # Deleting an event
+    assert company.delete_event(4) == 2
+    expected = scenario(12, transfer=False)
+    assert company.owners == expected.owners
+    assert len(company.history) == 6
+    assert [event['operation']['op'] for event in company.history][-2:] == ['remove_owner_percentage_relative', 'set_number_of_stocks']
+
+    # Failing replays leave the company as it was
+    owners, history = dict(company.owners), list(company.history)
+    with pytest.raises(KeyError):
+        company.edit_event(4, name='Nobody') # Removing an owner that does not exist
+    with pytest.raises(TypeError):
+        company.edit_event(3, not_an_argument=1)
+    assert company.owners == owners and company.history == history
+
+    with pytest.raises(KeyError):
+        company.edit_event(100, n_stocks=1)
+
+    # Events without operations cannot be replayed
+    company.add_to_history('Note', 'Not an operation')
+    with pytest.raises(ValueError):
+        company.edit_event(3, n_percentages=10)
+
+    # Changes without events cannot be replayed over
+    company = Company('Test', 'A', 1000)
+    company.add_owner('B', 500)
+    company.add_owner('C', 300, write_history=False)
+    company.transfer_stocks('A', 'D', 100)
+    with pytest.raises(ValueError):
+        company.edit_event(1, n_stocks=400)
+    assert company.owners == {'A': 900, 'B': 500, 'C': 300, 'D': 100}
+    company.transfer_stocks('A', 'E', 10)
+    company.edit_event(3, n_stocks=20) # The change is in the holdings of the event before it
+    assert company.owners == {'A': 880, 'B': 500, 'C': 300, 'D': 100, 'E': 20}
+
+    company.owners = {'A': 1}
+    with pytest.raises(ValueError):
+        company.delete_event(3)
+
+    # Thinned events cannot be replayed over, as the holdings before the event are not known
+    company = Company('Test', 'A', 1000)
+    for i in range(10):
+        company.add_owner(f'B{i}', 1)
+    company.transfer_stocks('A', 'C', 5)
+    company.set_history_retention(keep_last=1, checkpoint_every=4, merge_consecutive=False)
+    company.compact_history()
+    assert [event['id'] for event in company.history] == [0, 4, 8, 11]
+    with pytest.raises(ValueError):
+        company.edit_event(11, n_stocks=6)
+    assert company.owners['B9'] == 1 and company.owners['C'] == 5
+
+
+## Testing querying of the history
+def test_query_history():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Idea')
+    company.add_owners_percentage({'Johannes': 30, 'Sara': 30}, expansion=False)
+    company.add_owner(name='Stock Option Pool', n_stocks=2_000)
+    for receiver in ('Johannes', 'Sara', 'Johannes', 'Employee'):
+        company.transfer_stocks('Stock Option Pool', receiver, 100)
+    company.add_owner_percentage('Investor', 10, expansion=True)
+    company.distribute('Stock Option Pool', {'Sara': 100, 'Employee': 50})
+    company.remove_owner('Employee')
+
+    assert company.history[3]['fields'] == {'donor': 'Stock Option Pool', 'receiver': 'Johannes', 'amounts': {'Stock Option Pool': -100, 'Johannes': 100}}
+
+    assert [event['id'] for event in company.query_history(event_type='Transfering stocks', owner='Johannes')] == [3, 5]
+    assert [event['id'] for event in company.query_history(owner='Sara')] == [1, 4, 8]
+    assert [event['id'] for event in company.query_history(owner='Employee', operation='remove_owner')] == [9]
+    assert [event['id'] for event in company.query_history(expansion=True)] == [0, 2, 7]
+    assert [event['id'] for event in company.query_history(description='Employee')] == [6, 8, 9]
+    assert company.query_history(owner='Nobody') == []
+
+    # The indexes follow edits of the history
+    company.delete_event(3)
+    assert [event['id'] for event in company.query_history(event_type='Transfering stocks', owner='Johannes')] == [4]
+    company.edit_event(4, receiver='Investor 2')
+    rebuilt = Company('Rebuilt', 'A', 1)
+    rebuilt._history = company._history
+    rebuilt._rebuild_history_indexes()
+    for key in ('_event_type_index', '_operation_index', '_owner_index'):
+        assert {name: [event['id'] for event in events] for name, events in getattr(company, key).items()} == \
+               {name: [event['id'] for event in events] for name, events in getattr(rebuilt, key).items()}
+    indexes = company._owner_index
+    with pytest.raises(KeyError):
+        company.edit_event(4, receiver='Nobody', donor='Nobody')
+    assert company._owner_index is indexes and 'Nobody' not in indexes
+    assert company.memory_usage()['indexes'] > 0
+
+def test_share_classes():
+    company = Company(name='Test', n_stocks=800, original_owner='Founder')
+    company.define_share_class('preferred', voting=2, economic=1.5)
+    company.define_share_class('options', voting=0, outstanding=False)
+
+    company.add_owner('Investor', 200, share_class='preferred')
+    company.add_owners({'Employee 1': 50, 'Employee 2': 50}, share_class='options')
+    assert company.owners == {'Founder': 800}
+    assert company.number_of_stocks == 800
+    assert company.holdings('preferred') == {'Investor': 200}
+
+    assert company.economic_percentages() == pytest.approx({'Founder': 800 / 1100 * 100, 'Investor': 300 / 1100 * 100})
+    assert company.voting_percentages() == pytest.approx({'Founder': 800 / 1200 * 100, 'Investor': 400 / 1200 * 100})
+    assert company.fully_diluted() == {'Founder': 800, 'Investor': 200, 'Employee 1': 50, 'Employee 2': 50}
+
+    assert company.transfer_stocks('Employee 1', 'Employee 2', 100, share_class='options') == 50
+    assert company.remove_owner('Employee 2', 30, share_class='options') == 70
+    assert company.holdings('options') == {'Employee 2': 70}
+    assert company.history[-1]['fields']['share_class'] == 'options'
+    assert [event['id'] for event in company.query_history(owner='Employee 1')] == [2, 3]
+
+    with pytest.raises(KeyError):
+        company.add_owner('Investor', 10, share_class='unknown')
+    with pytest.raises(KeyError, match='not defined'):
+        company.transfer_stocks('Founder', 'Investor', 10, share_class='unknown')
+    with pytest.raises(KeyError, match='not defined'):
+        company.remove_owner('Founder', 10, share_class='unknown')
+    with pytest.raises(ValueError):
+        company.add_owners({'New': 10, 'Employee 2': -100}, share_class='options')
+    assert company.holdings('options') == {'Employee 2': 70}
+    with pytest.raises(KeyError):
+        company.transfer_stocks('Employee 1', 'Founder', 10, share_class='options')
+    with pytest.raises(ValueError):
+        company.add_owner('Investor', 10, expansion=False, share_class='preferred')
+    with pytest.raises(ValueError): # The history cannot restore the other classes
+        company.delete_event(1)
+
+def test_query_cache():
+    company = Company(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    company.add_owner('Test Owner 2', 100)
+    assert company.cache_info() is None
+
+    company.enable_query_cache(maxsize=2)
+    dataframe = company.history_dataframe()
+    assert company.history_dataframe() is dataframe
+    assert company._get_owner_percentage('Test Owner 1') == 50
+    assert company._get_owner_percentage('Test Owner 1') == 50
+    assert company.cache_info() == {'hits': 2, 'misses': 2, 'maxsize': 2, 'size': 2}
+
+    # Least recently used first
+    company.owner_history('Test Owner 2')
+    assert company.history_dataframe() is not dataframe
+    assert company.cache_info()['misses'] == 4
+
+    # Every change invalidates the cache
+    company.add_owner('Test Owner 3', 200)
+    assert company._get_owner_percentage('Test Owner 1') == 25
+    assert company.owner_history('Test Owner 1') == [100, 50, 25]
+    assert company.cache_info()['size'] == 2
+
+    with pytest.raises(KeyError): # Errors are not cached
+        company._get_owner_percentage('Nobody')
+
+    company.disable_query_cache()
+    assert company.cache_info() is None
+
+def test_iter_history():
+    company = Company(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    company.add_owner('Test Owner 2', 100)
+    company.transfer_stocks('Test Owner 1', 'Test Owner 3', 50)
+
+    events = list(company.iter_history(start=1, fields=('id', 'owners'), owners=('Test Owner 1', 'Test Owner 3')))
+    assert [dict(event) for event in events] == [
+        {'id': 1, 'owners': {'Test Owner 1': 100}},
+        {'id': 2, 'owners': {'Test Owner 1': 50, 'Test Owner 3': 50}},
+    ]
+    assert 'event_type' not in events[0]
+    with pytest.raises(TypeError): # Read only
+        events[0]['owners']['Test Owner 1'] = 0
+    assert company.history[1]['owners']['Test Owner 1'] == 100
+
+    # Also the dictionaries inside an event, which would change the replayed operations
+    company.add_owners({'Test Owner 4': 10})
+    event = next(company.iter_history(start=3, fields=('operation',)))
+    with pytest.raises(TypeError):
+        event['operation']['new_owners']['Test Owner 4'] = 999
+    assert event['operation']['new_owners'] == {'Test Owner 4': 10}
+    company.edit_event(2, n_stocks=40)
+    assert company.owners['Test Owner 4'] == 10
+
+    assert [event['id'] for event in company.iter_history(stop=2)] == [0, 1]
+    assert len(list(company.iter_history())) == 4
+    assert dict(next(company.iter_history()))['event_type'] == company.history[0]['event_type']
@@ -0,0 +1,25 @@
+import pytest
+from company_ownership import Company
+from company_ownership.differential import random_operations, run_differential
+
+class SameCompany(Company):
+    pass
+
+class FloorCompany(Company):
+    def _get_scaled_owner_dict(self, desired_number_of_stocks:int) -> dict:
+        current_number_of_stocks = self.number_of_stocks
+        return {name: stocks * desired_number_of_stocks // current_number_of_stocks for name, stocks in self._owners.items()}
+
+def test_random_operations():
+    operations = list(random_operations(200, seed=1))
+    assert operations == list(random_operations(200, seed=1))
+    assert len({operation['op'] for operation in operations}) == 11
+
+def test_run_differential():
+    report = run_differential({'same': SameCompany}, n_operations=500, seed=2)
+    assert report['operations'] == 500
+    assert 0 < report['errors'] < 500
+    assert set(report['ops_per_second']) == {'reference', 'same'}
+
+    with pytest.raises(AssertionError):
+        run_differential({'floor': FloorCompany}, n_operations=500, seed=2)
@@ -0,0 +1,129 @@
+import asyncio
+import json
+from company_ownership import Company
+from company_ownership.ingest import EventIngestor
+
+def grants(n:int) -> list:
+    return [{'op': 'transfer_stocks', 'donor': 'Stock Option Pool', 'receiver': f'Employee {i % 7}', 'n_stocks': 10} for i in range(n)]
+
+async def produce(events:list):
+    for event in events:
+        yield event
+
+def test_ingest():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Stock Option Pool')
+    reference = Company(name='Test', n_stocks=10_000, original_owner='Stock Option Pool')
+    events = grants(500) + [{'op': 'add_owner', 'name': f'Investor {i}', 'n_stocks': 100} for i in range(5)] + grants(700)
+    for event in events:
+        try:
+            reference.transfer_stocks(event['donor'], event['receiver'], event['n_stocks']) if 'donor' in event else reference.add_owner(event['name'], event['n_stocks'])
+        except KeyError:
+            pass # The pool is empty
+
+    async def run():
+        ingestor = EventIngestor(company, max_queue=50, max_batch=20)
+        await ingestor.start()
+        await ingestor.consume(produce(events))
+        await ingestor.stop()
+        return ingestor.metrics()
+
+    metrics = asyncio.run(run())
+    assert company.owners == reference.owners
+    assert metrics['received'] == metrics['applied'] == len(events)
+    assert metrics['queued'] == 0
+    assert metrics['operations'] < len(events) # Events were coalesced
+    assert metrics['errors'] == 200 # Transfers from the empty pool
+    assert metrics['throughput'] > 0
+
+def test_backpressure_and_socket():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Stock Option Pool')
+
+    async def run():
+        ingestor = EventIngestor(company, max_queue=10)
+
+        # Without a writer, producers are blocked by the full queue
+        producer = asyncio.create_task(ingestor.consume(produce(grants(30))))
+        await asyncio.sleep(0.01)
+        assert ingestor.metrics()['queued'] == 10
+        assert not producer.done()
+
+        await ingestor.start()
+        await producer
+
+        # Events over a local socket
+        server = await ingestor.serve()
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'{"op": not json\n')
+        writer.write(''.join(json.dumps(event) + '\n' for event in grants(20)).encode())
+        await writer.drain()
+        writer.close()
+        while ingestor.metrics()['received'] < 50:
+            await asyncio.sleep(0.01)
+        await ingestor.stop()
+        server.close()
+        await server.wait_closed()
+        return ingestor
+
+    ingestor = asyncio.run(run())
+    metrics = ingestor.metrics()
+    assert metrics['applied'] == 50
+    assert [line for line, _ in ingestor.errors] == [b'{"op": not json\n']
+    assert company.owners['Stock Option Pool'] == 10_000 - 500
+
+def test_failing_coalesced_events():
+    company = Company(name='Test', n_stocks=100, original_owner='Founder')
+    events = [{'op': 'transfer_stocks', 'donor': 'Nobody', 'receiver': f'Employee {i}', 'n_stocks': 0} for i in range(2)]
+    events += [{'op': 'add_owner', 'name': 'Investor 1', 'n_stocks': 10}, {'op': 'add_owner', 'name': 'Investor 2', 'n_stocks': -10}]
+    events += [{'op': 'add_owner', 'name': 'Investor 3', 'n_stocks': 10}]
+
+    async def run():
+        ingestor = EventIngestor(company)
+        await ingestor.start()
+        for event in events:
+            await ingestor.put(event)
+        await asyncio.wait_for(ingestor.stop(), 5)
+        return ingestor
+
+    ingestor = asyncio.run(run())
+    assert [type(e) for _, e in ingestor.errors] == [KeyError, KeyError, KeyError] # As when applied one by one
+    assert company.owners == {'Founder': 100, 'Investor 1': 10, 'Investor 3': 10}
+
+def test_events_that_are_not_dicts():
+    company = Company(name='Test', n_stocks=100, original_owner='Founder')
+    events = [{'op': 'transfer_stocks', 'donor': 'Founder', 'receiver': 'Employee 1', 'n_stocks': 10}, 5,
+              {'op': 'transfer_stocks', 'donor': 'Founder', 'receiver': 'Employee 2', 'n_stocks': 10}]
+
+    async def run():
+        ingestor = EventIngestor(company)
+        for event in events: # Queued before starting, so they are one batch
+            await ingestor.put(event)
+        await ingestor.start()
+        await asyncio.wait_for(ingestor.stop(), 5)
+        return ingestor
+
+    ingestor = asyncio.run(run())
+    assert ingestor.metrics()['batches'] == 1
+    assert [event for event, _ in ingestor.errors] == [5]
+    assert company.owners == {'Founder': 80, 'Employee 1': 10, 'Employee 2': 10}
+
+def test_writer_survives_errors():
+    company = Company(name='Test', n_stocks=100, original_owner='Founder')
+
+    async def run():
+        ingestor = EventIngestor(company)
+        apply = ingestor._apply
+        def fail_once(events):
+            ingestor._apply = apply
+            raise RuntimeError('Failed')
+        ingestor._apply = fail_once
+        await ingestor.start()
+        await ingestor.put({'op': 'add_owner', 'name': 'Investor 1', 'n_stocks': 10})
+        await asyncio.wait_for(ingestor.join(), 5)
+        await ingestor.put({'op': 'add_owner', 'name': 'Investor 2', 'n_stocks': 10})
+        await asyncio.wait_for(ingestor.stop(), 5)
+        return ingestor
+
+    ingestor = asyncio.run(run())
+    assert len(ingestor.errors) == 1
+    assert company.owners == {'Founder': 100, 'Investor 2': 10}
@@ -0,0 +1,68 @@
+import pytest
+from company_ownership import Company
+from company_ownership.metrics import MetricTracker, ConcentrationTracker, TopShareTracker, GroupShareTracker, ThresholdTracker
+
+def test_subscribe():
+    company = Company(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    calls = []
+    callback = lambda c, changes: calls.append(changes)
+    company.subscribe(callback)
+
+    company.add_owner(name='Test Owner 2', n_stocks=100)
+    company.transfer_stocks('Test Owner 1', 'Test Owner 2', 100)
+    company.add_owner_percentage('Test Owner 3', 50, expansion=False) # Nested calls give one notification
+    assert calls == [{'Test Owner 2': (0, 100)},
+                     {'Test Owner 1': (100, 0), 'Test Owner 2': (100, 200)},
+                     {'Test Owner 2': (200, 100), 'Test Owner 3': (0, 100)}]
+
+    company.unsubscribe(callback)
+    company.add_owner(name='Test Owner 2', n_stocks=100)
+    assert len(calls) == 3
+
+def test_trackers():
+    company = Company(name='Test', n_stocks=1000, original_owner='Idea')
+    company.add_owners_percentage({'Johannes': 30, 'Sara': 30}, expansion=False)
+    trackers = [ConcentrationTracker().attach(company), TopShareTracker(2).attach(company),
+                GroupShareTracker(['Johannes', 'Sara']).attach(company), ThresholdTracker().attach(company)]
+    concentration, top, founders, thresholds = trackers
+
+    assert concentration.value == pytest.approx(0.4**2 * 10_000 + 2 * 0.3**2 * 10_000)
+    assert top.value == pytest.approx(70)
+    assert founders.value == pytest.approx(60)
+    assert thresholds.value == 1 # Idea owns 40%
+
+    company.add_owner('Stock Option Pool', 500)
+    company.transfer_stocks('Idea', 'Johannes', 400)
+    company.add_owner_percentage('Investor', 20)
+    company.remove_owner('Stock Option Pool', shrink=False)
+
+    owners = company.owners
+    total = company.number_of_stocks
+    assert concentration.value == pytest.approx(sum((stocks / total)**2 for stocks in owners.values()) * 10_000)
+    assert top.value == pytest.approx(sum(sorted(owners.values())[-2:]) / total * 100)
+    assert founders.value == pytest.approx((owners['Johannes'] + owners['Sara']) / total * 100)
+    assert len(concentration.values) == len(concentration.versions) == 5
+    assert list(concentration.versions) == sorted(concentration.versions)
+
+    # Idea was diluted below 33.4% by the pool, Johannes passed it by the transfer, and 50% when the pool was removed
+    assert [(name, threshold, upwards) for _, name, threshold, upwards in thresholds.crossings] == [
+        ('Idea', 33.4, False), ('Johannes', 33.4, True), ('Johannes', 50, True)]
+    assert thresholds.value == 1
+
+def test_threshold_tracker_shrinking_total():
+    company = Company(name='Test', n_stocks=40, original_owner='A')
+    company.add_owners({'B': 30, 'C': 30})
+    thresholds = ThresholdTracker().attach(company)
+
+    company.remove_owner('C') # B goes from 30% to 42.9% without changing
+    assert [(name, threshold, upwards) for _, name, threshold, upwards in thresholds.crossings] == [
+        ('B', 33.4, True), ('A', 50, True)]
+    assert thresholds._levels == {'A': 2, 'B': 1}
+
+def test_incomplete_tracker():
+    class CountTracker(MetricTracker):
+        def update(self, company, changes):
+            pass
+
+    with pytest.raises(TypeError): # 'value' is missing
+        CountTracker()
@@ -0,0 +1,34 @@
+import pytest
+from company_ownership import Company
+from company_ownership.portfolio import Portfolio
+
+def test_portfolio():
+    first = Company(name='First', n_stocks=900, original_owner='Founder 1')
+    first.add_owner('Investor 1', 100)
+    second = Company(name='Second', n_stocks=500, original_owner='Founder 2')
+    portfolio = Portfolio([first, second])
+
+    assert len(portfolio) == 2 and 'First' in portfolio
+    assert portfolio.holdings('Investor 1') == {'First': 100}
+
+    # The index follows the changes of the companies
+    second.add_owner('Investor 1', 500)
+    first.transfer_stocks('Investor 1', 'Founder 1', 50)
+    assert portfolio.holdings('Investor 1') == {'First': 50, 'Second': 500}
+    assert portfolio.positions('Investor 1') == pytest.approx({'First': 5, 'Second': 50})
+    assert portfolio.exposure('Investor 1', {'First': 1_000_000, 'Second': 2_000_000}) == pytest.approx(1_050_000)
+    assert portfolio.weighted_position('Investor 1') == pytest.approx(27.5)
+    assert portfolio.weighted_position('Investor 1', {'First': 3, 'Second': 1}) == pytest.approx(16.25)
+
+    first.remove_owner('Investor 1')
+    assert portfolio.holdings('Investor 1') == {'Second': 500}
+    assert [event['id'] for event in portfolio.history('Investor 1')['First']] == [1, 2, 3]
+    assert set(portfolio.owners()) == {'Founder 1', 'Founder 2', 'Investor 1'}
+
+    assert portfolio.remove('Second') is second
+    second.add_owner('Investor 2', 10)
+    assert portfolio.holdings('Investor 1') == {}
+    assert 'Investor 2' not in portfolio.owners()
+
+    with pytest.raises(ValueError):
+        portfolio.add(Company(name='First', original_owner='Someone'))
@@ -0,0 +1,54 @@
+import pytest
+from company_ownership import Company
+from company_ownership.rounds import solve_round
+
+def test_solve_round():
+    # No convertibles and no pool: the investor gets its share of the post-money valuation
+    price, new_stocks, pre_money_stocks = solve_round(1_000, 1_000_000, {'Investor': 250_000})
+    assert price == 1_000
+    assert new_stocks == {'Investor': 250}
+    assert pre_money_stocks == 1_000
+
+    # A SAFE with a cap below the discounted price converts at the cap
+    price, new_stocks, pre_money_stocks = solve_round(10_000, 8_000_000, {'Investor': 2_000_000},
+                                                      {'Angel': {'amount': 500_000, 'cap': 4_000_000, 'discount': 0.2}}, 0, 10)
+    assert new_stocks == {'Angel': 1667, 'Investor': 3333, None: 1667}
+    assert pre_money_stocks == 13_333
+    assert price == pytest.approx(600)
+
+    # The pool is only topped up
+    price, new_stocks, _ = solve_round(10_000, 1_000_000, {'Investor': 100_000}, pool_stocks=2_000, pool_percentage=5)
+    assert new_stocks == {'Investor': 1_000}
+
+    with pytest.raises(ValueError):
+        solve_round(1_000, 1_000_000, {}, {'Note': {'amount': 2_000_000}})
+    with pytest.raises(ValueError):
+        solve_round(1_000, 0, {'Investor': 1})
+    with pytest.raises(ValueError):
+        solve_round(1_000, 1_000_000, {'Investor': 500_000}, pool_percentage=70)
+    # A pool that is large enough needs no top-up, even if it could not have been topped up
+    assert solve_round(1_000, 1_000_000, {'Investor': 500_000}, pool_stocks=800, pool_percentage=50)[1] == {'Investor': 500}
+
+def test_close_round():
+    company = Company(name='Test', n_stocks=10_000, original_owner='Founder')
+    new_stocks = company.close_round(8_000_000, {'Investor': 2_000_000},
+                                     convertibles={'Angel': {'amount': 500_000, 'cap': 4_000_000, 'discount': 0.2}},
+                                     pool_owner='Stock Option Pool', pool_percentage=10)
+
+    assert new_stocks == {'Angel': 1667, 'Investor': 3333, 'Stock Option Pool': 1667}
+    assert company.number_of_stocks == 16_667
+    assert company._get_owner_percentage('Investor') == pytest.approx(20, abs=0.01)
+    assert company._get_owner_percentage('Stock Option Pool') == pytest.approx(10, abs=0.01)
+
+    assert len(company.history) == 2
+    assert company.history[-1]['event_type'] == 'Closing round (expansion)'
+    assert company.history[-1]['operation']['op'] == 'close_round'
+    assert [event['id'] for event in company.query_history(owner='Angel')] == [1]
+
+    with pytest.raises(ValueError):
+        company.close_round(1_000_000, {'Investor': 1}, pool_percentage=10)
+    with pytest.raises(ValueError):
+        company.close_round(1_000_000, {'Investor': -1})
+    with pytest.raises(ValueError): # The pool cannot be 70% after the investor takes a third
+        Company('Test', 'A', 1000).close_round(1_000_000, {'I': 500_000}, pool_owner='Pool', pool_percentage=70)
+    assert company.number_of_stocks == 16_667
@@ -0,0 +1,36 @@
+import random
+import pytest
+from company_ownership import Company
+from company_ownership import scaling
+from company_ownership.scaling import scale_stocks
+
+def test_scale_stocks(monkeypatch):
+    assert scale_stocks([1, 1, 1], 2) == [1, 1, 0] # The earliest first on ties
+    assert scale_stocks([35, 115], 100) == [23, 77]
+    assert scale_stocks([5, 0], 0) == [0, 0]
+    with pytest.raises(ZeroDivisionError):
+        scale_stocks([0, 0], 10)
+
+    # Exact above 2^53, where floats cannot represent every number of stocks
+    big = 2**60 + 1
+    assert scale_stocks([big, big, 1], 2**62 + 3) == [(2**62 + 3) * big // (2 * big + 1) + 1, (2**62 + 3) * big // (2 * big + 1), 2]
+    assert sum(scale_stocks([big, 3, 7], 10**30)) == 10**30
+
+    # The vectorized and the Python version agree
+    rng = random.Random(1)
+    for _ in range(20):
+        stocks = [rng.choice((0, rng.randint(1, 10), rng.randint(1, 10_000))) for _ in range(100)]
+        total = rng.randint(0, 1_000_000)
+        vectorized = scale_stocks(stocks, total)
+        monkeypatch.setattr(scaling, '_VECTORIZE_FROM', 10**9)
+        assert scale_stocks(stocks, total) == vectorized
+        monkeypatch.undo()
+        assert sum(vectorized) == total
+
+def test_rescaling_is_exact():
+    company = Company(name='Test', n_stocks=1, original_owner='A')
+    company.add_owners({'B': 1, 'C': 1})
+    company.number_of_stocks = 100
+    assert company.owners == {'A': 34, 'B': 33, 'C': 33}
+    company.add_owner('D', 10, expansion=False)
+    assert company.number_of_stocks == 100
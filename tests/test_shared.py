@@ -0,0 +1,47 @@
+import multiprocessing
+import pytest
+from company_ownership import Company
+from company_ownership.shared import SharedCapTable
+
+def _read_in_worker(name:str) -> tuple:
+    with SharedCapTable.attach(name) as table:
+        return table.owners, table.owner_history('Sara', percentage=False)
+
+@pytest.fixture
+def company():
+    c = Company(name='Test', n_stocks=1000, original_owner='Idea')
+    c.add_owners_percentage({'Johannes': 30, 'Sara': 30}, expansion=False)
+    c.add_owner('Stock Option Pool', 200)
+    c.transfer_stocks('Stock Option Pool', 'Sara', 50)
+    c.transfer_stocks('Stock Option Pool', 'Ærlig Æsel', 50)
+    return c
+
+def test_publish_and_attach(company: Company):
+    table = SharedCapTable.publish(company)
+    try:
+        with SharedCapTable.attach(table.name) as view:
+            assert view.owners == company.owners
+            assert list(view.owners) == list(company.owners)
+            assert view.number_of_stocks == company.number_of_stocks
+            assert view.get_owner_percentage('Sara') == company._get_owner_percentage('Sara')
+            for name in ('Idea', 'Sara', 'Stock Option Pool', 'Ærlig Æsel'):
+                assert view.owner_history(name) == company.owner_history(name)
+                assert view.owner_history(name, percentage=False) == company.owner_history(name, percentage=False)
+                assert view.owner_history(name, fraction=True) == company.owner_history(name, fraction=True)
+
+            with pytest.raises(KeyError):
+                view.owner_history('Nobody')
+            with pytest.raises(KeyError):
+                view.get_owner_percentage('Nobody')
+
+            # The view is read only
+            with pytest.raises(TypeError):
+                view._entry_stocks[0] = 0
+
+        # Reading from another process
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            owners, sara_history = pool.apply(_read_in_worker, (table.name,))
+        assert owners == company.owners
+        assert sara_history == company.owner_history('Sara', percentage=False)
+    finally:
+        table.unlink()
@@ -0,0 +1,31 @@
+import pytest
+from company_ownership import Company
+from company_ownership.simulation import DilutionSimulator
+
+def test_dilution_simulator():
+    company = Company(name='Test', n_stocks=8_000, original_owner='Founder')
+    company.add_owner('Angel', 2_000)
+
+    # Without rounds, every path ends where it started
+    simulator = DilutionSimulator(company, n_rounds=(0, 0), seed=1).run(1_000)
+    assert simulator.mean() == pytest.approx({'Founder': 80, 'Angel': 20, 'New investors': 0})
+    assert simulator.quantiles((50,))['Founder'][50] == pytest.approx(80, abs=0.01)
+
+    # One round of exactly 20%, with the pool always refreshed with 10% first
+    simulator = DilutionSimulator(company, n_rounds=(1, 1), stake=(20, 20), pool_owner='Pool', pool_refresh=1,
+                                  pool_percentage=(10, 10), seed=1).run(1_000)
+    assert simulator.mean() == pytest.approx({'Founder': 57.6, 'Angel': 14.4, 'Pool': 8, 'New investors': 20})
+
+    # Reproducible, and the memory does not depend on the number of paths
+    first = DilutionSimulator(company, pool_owner='Pool', owners=['Founder'], seed=2).run(5_000, batch_size=1_000)
+    second = DilutionSimulator(company, pool_owner='Pool', owners=['Founder'], seed=2).run(5_000, batch_size=1_000)
+    assert first.owners == ['Founder', 'Pool', 'Other owners', 'New investors']
+    assert first.quantiles() == second.quantiles()
+    assert first.n_paths == 5_000
+    assert first._counts.shape == (4, first.bins)
+
+    founder = first.quantiles((5, 50, 95))['Founder']
+    assert 0 < founder[5] <= founder[50] <= founder[95] < 80
+
+    with pytest.raises(RuntimeError):
+        DilutionSimulator(company).quantiles()
@@ -0,0 +1,110 @@
+import threading
+import pytest
+from company_ownership.threadsafe import ThreadSafeCompany
+
+def test_snapshot():
+    company = ThreadSafeCompany(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    company.add_owner(name='Test Owner 2', n_stocks=100)
+    snapshot = company.snapshot()
+    assert snapshot.version == company.version == 2
+
+    company.transfer_stocks('Test Owner 1', 'Test Owner 3', 50)
+    company.remove_owner('Test Owner 2', shrink=False)
+    assert snapshot.owners == {'Test Owner 1': 100, 'Test Owner 2': 100}
+    assert len(snapshot.history) == 2
+    assert snapshot.owner_history('Test Owner 1') == [100.0, 50.0]
+    assert company.owners == {'Test Owner 1': 100, 'Test Owner 3': 100}
+    assert company.version == 4
+
+    with pytest.raises(TypeError):
+        snapshot.add_owner(name='Test Owner 4', n_stocks=100)
+
+def test_concurrent_readers():
+    company = ThreadSafeCompany(name='Test', n_stocks=1_000_000, original_owner='Stock Option Pool')
+    n_transfers = 2_000
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for i in range(n_transfers):
+            company.transfer_stocks('Stock Option Pool', f'Employee {i % 50}', 10)
+        done.set()
+
+    def reader():
+        try:
+            versions = []
+            while not done.is_set():
+                snapshot = company.snapshot()
+                assert sum(snapshot.owners.values()) == snapshot.number_of_stocks == 1_000_000
+                assert len(snapshot.history) == snapshot.version
+                str(company) # Formatting while the owners change
+                versions.append(company.version)
+            assert versions == sorted(versions)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader) for _ in range(4)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert company.owners['Stock Option Pool'] == 1_000_000 - 10 * n_transfers
+    assert len(company.history) == n_transfers + 1
+
+def test_snapshot_iter_history():
+    company = ThreadSafeCompany(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    snapshot = company.snapshot()
+    company.add_owner('Test Owner 2', 100)
+    assert [event['id'] for event in snapshot.iter_history()] == [0]
+    assert [event['id'] for event in company.iter_history(fields=('id',))] == [0, 1]
+
+def test_snapshot_after_edit():
+    company = ThreadSafeCompany(name='Test', n_stocks=100, original_owner='Test Owner 1')
+    company.transfer_stocks('Test Owner 1', 'Test Owner 2', 10)
+    company.transfer_stocks('Test Owner 1', 'Test Owner 3', 10)
+    snapshot = company.snapshot()
+    company.delete_event(1)
+    company.transfer_stocks('Test Owner 1', 'Test Owner 4', 10) # Gets the id 2 again
+    assert [event['id'] for event in snapshot.query_history(operation='transfer_stocks')] == [1, 2]
+    assert snapshot.query_history(owner='Test Owner 4') == []
+    assert [event['id'] for event in company.query_history(owner='Test Owner 4')] == [2]
+
+def test_concurrent_edits():
+    company = ThreadSafeCompany(name='Test', n_stocks=10_000, original_owner='Test Owner 1')
+    for i in range(200):
+        company.transfer_stocks('Test Owner 1', 'Test Owner 2', 1)
+    errors = []
+    def edit():
+        try:
+            for _ in range(20):
+                company.edit_event(1, n_stocks=2)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=edit) for _ in range(2)] + [threading.Thread(target=company.add_owner, args=('Test Owner 3', 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert company.owners['Test Owner 2'] == 201 and company.owners['Test Owner 3'] == 1
+    assert [event['id'] for event in company.history] == list(range(202))
+
+def test_background_compaction():
+    company = ThreadSafeCompany(name='Test', n_stocks=100_000, original_owner='Stock Option Pool')
+    for i in range(2_000):
+        company.transfer_stocks('Stock Option Pool', f'Employee {i % 50}', 1)
+    company.set_history_retention(keep_last=10)
+    version = company.version
+    calls = []
+    company.subscribe(lambda c, changes: calls.append(changes))
+
+    future = company.compact_history(background=True)
+    for i in range(500):
+        company.add_owner(f'Investor {i}', 1)
+    assert future.result() > 0
+
+    assert company.version == version + 501 # Every change counts, the compaction included
+    assert len(calls) == 500
+    assert company.owners['Investor 499'] == 1